@@ -1,11 +1,15 @@
 from fastapi import FastAPI, HTTPException, Query, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, Response
 import pandas as pd
+import numpy as np
 import os
 from typing import List, Optional, Dict, Any
 import glob
 import re
+import heapq
+import itertools
+import warnings
 import folium
 from folium.plugins import HeatMap
 from pydantic import BaseModel
@@ -18,8 +22,41 @@ from reportlab.lib import colors
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
+from data_config import (
+    DATA_DIR, FUTURE_DATA_DIR, MODEL_FOLDERS, POLLUTANT_MAP, STANDARD_POLLUTANTS, CITY_COORDS
+)
+from dataset_cache import DatasetCache
+import columnar_store
+from schema_index import SchemaIndex
+from timestamps import DateColumnCache, parse_date_column
+from time_index import TimeIndex, parse_time_range
+from resample import RAW_RESOLUTION, RESOLUTIONS, AGGREGATE_KEYS, resample_series, downsample, label_buckets, split_by_year
+from rollups import PERIODS, STATS, RollupStore, city_version, load_city_series, window_period
+from render_cache import LRUCache, RenderCache, etag_matches
+from spatial_index import SpatialIndex, closest
+from interpolation import grid_shape, idw_weights, interpolate, make_grid, station_bounds
+from heatmap_frames import FRAME_DTYPES, HEATMAP_MAX_FRAMES, align_station_values, encode_frames, frame_starts
+from loader_pool import map_files
+from blocking import run_blocking
+from catalog import Catalog
+from prediction_store import PredictionStore, align_series
+from backtest import HORIZON_BUCKETS, METRICS, best_models, coverage, forecast_pollutant, horizon_label, score_forecast
+from contextlib import asynccontextmanager
+from response_formats import (
+    JSON_FORMAT, STREAM_MEDIA_TYPES, BINARY_MEDIA_TYPES, RECORDS_SHAPE, COLUMNS_SHAPE, ARROW_AVAILABLE,
+    peek_batches, streaming_records_response, columns_payload, columns_response, binary_series_response
+)
 
-app = FastAPI(title="Pollution Heatmap API")
+@asynccontextmanager
+async def lifespan(app):
+    # Build the dataset catalog and load the forecasts before serving requests
+    await run_blocking(CATALOG.refresh)
+    await run_blocking(PREDICTIONS.load_all)
+    # Score the forecasts up front so /api/backtest answers from the cache
+    await run_blocking(warm_backtests)
+    yield
+
+app = FastAPI(title="Pollution Heatmap API", lifespan=lifespan)
 
 # Enable CORS for frontend integration
 app.add_middleware(
@@ -30,40 +67,62 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Base directory for data files
-
-DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Data")
+# Report the data directories (see data_config.py)
 print(f"Data directory: {DATA_DIR}")
 print(f"Data directory exists: {os.path.exists(DATA_DIR)}")
 if os.path.exists(DATA_DIR):
     print(f"Data directory contents: {os.listdir(DATA_DIR)}")
 
-# Map of standardized pollutant names to possible column name variations
-POLLUTANT_MAP = {
-    'PM2.5': ['PM2.5', 'PM2.5 (µg/m³)'],
-    'PM10': ['PM10', 'PM10 (µg/m³)'],
-    'NO2': ['NO2', 'NO2 (µg/m³)'],
-    'SO2': ['SO2', 'SO2 (µg/m³)'],
-    'CO': ['CO', 'CO (mg/m³)'],
-    'Ozone': ['Ozone', 'Ozone (µg/m³)'],
-    'NO': ['NO', 'NO (µg/m³)'],
-    'NOx': ['NOx', 'NOx (ppb)'],
-    'NH3': ['NH3', 'NH3 (µg/m³)'],
-    'Benzene': ['Benzene', 'Benzene (µg/m³)'],
-    'AT': ['AT',"AT (Â°C)"],
-}
-
-# Standard pollutants to display
-STANDARD_POLLUTANTS = ['PM2.5', 'PM10', 'NO2', 'SO2', 'CO', 'Ozone','AT']
-# Default city coordinates for generating synthetic location data
-CITY_COORDS = {
-    'Byculla': (18.9794, 72.8368),
-    'Colaba': (18.9100, 72.8050),
-    'CSMT Airport': (18.9400, 72.8350),
-    'Mazgaon': (18.9600, 72.8450),
-    'Sion': (19.0390, 72.8619),
-    'Worli': (18.9925, 72.8175)
-}
+# Shared cache of parsed CSV files under DATA_DIR and FUTURE_DATA_DIR
+DATASET_CACHE = DatasetCache()
+
+# Header index recording the date column and pollutant aliases of each file
+SCHEMA_INDEX = SchemaIndex(POLLUTANT_MAP)
+
+# Sorted timestamp index of each file, used for start/end range queries
+TIME_INDEX = TimeIndex()
+
+# Parsed date column (datetime64 values and date strings) of each file
+DATE_COLUMNS = DateColumnCache()
+
+# Cities, models, years, pollutants and coverage of every data file
+CATALOG = Catalog(DATA_DIR, FUTURE_DATA_DIR, POLLUTANT_MAP)
+
+# Forecast arrays per (model, city, year, column) for /api/prediction-data
+PREDICTIONS = PredictionStore(FUTURE_DATA_DIR)
+
+# /api/backtest scorecards per city, keyed by the observed and forecast data versions
+BACKTESTS = LRUCache(32)
+
+# Rendered /api/folium-map pages keyed by parameters and data version
+MAP_CACHE = RenderCache()
+
+# Spatial indexes for /api/location-info: city centers, and located samples per (city, pollutant)
+STATION_INDEX = None
+SAMPLE_INDEXES = {}
+
+# IDW interpolation grid over the stations, and interpolated grids per (pollutant, window)
+STATION_GRID = None
+GRID_CACHE = LRUCache(64)
+
+# Encoded /api/heatmap-frames blobs keyed by parameters and data version
+FRAME_CACHE = RenderCache(32)
+
+def read_dataset(csv_file, columns=None):
+    """
+    Read a Data/ file, preferring its columnar store copy (see ingest.py) when up to date.
+    Pass `columns` to load only those columns.
+    """
+    columns = [col for col in columns if col] if columns else None
+    if columnar_store.is_fresh(csv_file):
+        return DATASET_CACHE.load(
+            csv_file,
+            lambda path: columnar_store.load_frame(path, columns),
+            variant=("columnar", tuple(columns) if columns else None)
+        )
+    if columns:
+        return DATASET_CACHE.read_csv(csv_file, usecols=columns)
+    return DATASET_CACHE.read_csv(csv_file)
 
 @app.get("/")
 async def root():
@@ -72,8 +131,7 @@ async def root():
 @app.get("/api/cities")
 async def get_cities():
     """Get list of all available cities"""
-    cities = [city for city in os.listdir(DATA_DIR) if os.path.isdir(os.path.join(DATA_DIR, city))]
-    return {"cities": cities}
+    return {"cities": CATALOG.cities()}
 
 @app.get("/api/pollutants")
 async def get_pollutants():
@@ -82,26 +140,40 @@ async def get_pollutants():
     # This ensures consistent pollutant options regardless of file format
     return {"pollutants": STANDARD_POLLUTANTS}
 
-def find_pollutant_column(df, pollutant):
-    """Find the actual column name for a pollutant in the dataframe"""
-    if pollutant in POLLUTANT_MAP:
-        for possible_name in POLLUTANT_MAP[pollutant]:
-            if possible_name in df.columns:
-                return possible_name
-    return None
+@app.get("/api/catalog")
+async def get_catalog():
+    """
+    Get the years, pollutants, row counts, time coverage and null ratios of every
+    data and prediction file, so clients know what exists before asking for it
+    """
+    return Response(CATALOG.body(), media_type="application/json")
 
-def extract_date_column(df):
-    """Find and extract the date column from the dataframe"""
+@app.get("/api/cache-stats")
+async def get_cache_stats():
+    """Get hit/miss counters and memory usage of the dataset and map caches"""
+    return {"datasets": DATASET_CACHE.stats(), "maps": MAP_CACHE.stats(), "grids": GRID_CACHE.stats(), "frames": FRAME_CACHE.stats(), "predictions": PREDICTIONS.stats(), "backtests": BACKTESTS.stats()}
+
+def file_dates(csv_file, df, date_column):
+    """
+    Return the memoized ParsedDates of a file's date column. `df` must hold
+    every row of the file (select rows from the result afterwards).
+    """
+    return DATE_COLUMNS.get(csv_file, date_column, df[date_column], df.attrs.get('date_format'))
+
+def extract_date_column(df, parsed=None):
+    """
+    Find the date column of the dataframe and add a 'Date' column of date strings.
+    `parsed` is the already parsed date column (see file_dates), aligned with `df`.
+    """
     # Check for standard date column names
     for col_name in ['Date', 'Timestamp']:
         if col_name in df.columns:
-            # If it's a Timestamp column, we'll clean it to get just the date part
+            # If it's a Timestamp column, we'll reduce it to just the date part
             if col_name == 'Timestamp':
                 try:
-                    # Handle potential NaN or float values by converting to string first
-                    df['Date'] = df[col_name].astype(str).apply(
-                        lambda x: x.split(' ')[0] if ' ' in x and x != 'nan' and x != 'None' else x
-                    )
+                    if parsed is None:
+                        parsed = parse_date_column(df[col_name], df.attrs.get('date_format'))
+                    df['Date'] = parsed.labels
                     return 'Date'
                 except Exception as e:
                     print(f"Error processing Timestamp column: {str(e)}")
@@ -116,9 +188,7 @@ def extract_date_column(df):
             # Extract just the date part if it's a timestamp
             try:
                 if df[col].dtype == object and any(' ' in str(x) for x in df[col].dropna().head()):
-                    df['Date'] = df[col].astype(str).apply(
-                        lambda x: x.split(' ')[0] if ' ' in x and x != 'nan' and x != 'None' else x
-                    )
+                    df['Date'] = parse_date_column(df[col]).labels
                     return 'Date'
                 return col
             except Exception as e:
@@ -130,14 +200,260 @@ def extract_date_column(df):
     df['Date'] = pd.date_range(start='2023-01-01', periods=len(df)).astype(str)
     return 'Date'
 
+def build_series_columns(df, value_col, date_col, fallback_date, city, jitter=0.005):
+    """
+    Extract the non-empty values of one file as parallel arrays using whole-column
+    operations. Returns None when the file has no usable values.
+    """
+    # Coerce the value column to numbers; blanks, 'NA' and junk become NaN
+    values = pd.to_numeric(df[value_col], errors='coerce')
+    mask = values.notna().to_numpy()
+    count = int(mask.sum())
+    if count == 0:
+        return None
+    
+    # Missing dates fall back to the first day of the file's year
+    dates = df[date_col][mask]
+    dates = dates.astype(object).where(dates.notna(), fallback_date)
+    
+    latitude, longitude = scatter_coords(city, count, jitter)
+    return {
+        "date": dates.astype(str).tolist(),
+        "value": values.to_numpy()[mask],
+        "latitude": latitude,
+        "longitude": longitude,
+    }
+
+def scatter_coords(city, count, jitter=0.005):
+    """Scatter `count` points around the city center for visualization, as (lats, lons)"""
+    base_lat, base_lon = CITY_COORDS.get(city, (19.0, 72.8))  # Default to Mumbai center
+    rng = np.random.default_rng()
+    return base_lat + rng.uniform(-jitter, jitter, count), base_lon + rng.uniform(-jitter, jitter, count)
+
+def build_series_arrays(df, value_col, date_col, parsed=None):
+    """
+    Extract the non-empty values of one file as datetime64 timestamps and floats,
+    without converting anything to Python objects. `parsed` is the already parsed
+    date column, aligned with `df`. Returns None when the file has no usable values.
+    """
+    values = pd.to_numeric(df[value_col], errors='coerce')
+    mask = values.notna().to_numpy()
+    if not mask.any():
+        return None
+    if date_col:
+        if parsed is None:
+            parsed = parse_date_column(df[date_col], df.attrs.get('date_format'))
+        timestamps = parsed.timestamps[mask]
+    else:
+        timestamps = np.full(int(mask.sum()), np.datetime64('NaT'), dtype='datetime64[ns]')
+    return {"timestamp": timestamps, "value": values.to_numpy()[mask]}
+
+def build_pollution_records(columns, year, city):
+    """Turn the arrays of one file into the list-of-objects response shape"""
+    return [
+        {
+            "date": date_value,
+            "year": year,
+            "latitude": lat,
+            "longitude": lon,
+            "value": value,
+            "city": city  # Use the requested city name
+        }
+        for date_value, lat, lon, value in zip(
+            columns["date"],
+            columns["latitude"].tolist(),
+            columns["longitude"].tolist(),
+            columns["value"].tolist()
+        )
+    ]
+
+def load_pollution_file(csv_file, city, pollutant, timestamps=False, time_range=None):
+    """
+    Load one of a city's files and return (year, arrays) for the pollutant, or
+    None when the file has no data for it. Runs on the loader pool.
+    """
+    # Skip files outside the requested range without opening them
+    if time_range and not TIME_INDEX.may_overlap(csv_file, *time_range):
+        return None
+    try:
+        # Extract year from filename
+        year = os.path.basename(csv_file).split('.')[0]
+        
+        # Look up the pollutant column from the file header
+        schema = SCHEMA_INDEX.get(csv_file)
+        pollutant_col = schema["pollutants"].get(pollutant)
+        if not pollutant_col:
+            print(f"Pollutant '{pollutant}' not found in {csv_file}")
+            return None
+        
+        # Read only the date and pollutant columns
+        date_column = schema["date_column"]
+        df = read_dataset(csv_file, [date_column, pollutant_col])
+        
+        # Parse the dates once per file; later requests reuse the result
+        dates = file_dates(csv_file, df, date_column) if date_column else None
+        
+        # Narrow to the requested range with a binary search on the sorted timestamps
+        if time_range:
+            if not date_column:
+                return None
+            rows = TIME_INDEX.select(csv_file, *time_range, load_dates=lambda: pd.Series(dates.timestamps))
+            df = df.iloc[rows]
+            dates = dates.take(rows)
+        
+        if timestamps:
+            columns = build_series_arrays(df, pollutant_col, date_column, dates)
+        else:
+            # Extract the date column
+            date_col = extract_date_column(df, dates)
+            if not date_col:
+                print(f"Date column not found in {csv_file}")
+                return None
+            
+            # Extract the values of this file column-wise
+            columns = build_series_columns(df, pollutant_col, date_col, f"{year}-01-01", city)
+    
+    except Exception as e:
+        print(f"Error processing {csv_file}: {str(e)}")
+        # Continue to next file rather than failing completely
+        return None
+    
+    return (year, columns) if columns is not None else None
+
+def iter_pollution_columns(city, pollutant, csv_files, timestamps=False, time_range=None):
+    """
+    Yield (year, arrays) for each of a city's files that has data for the pollutant,
+    in year order. Files are loaded concurrently on the loader pool.
+    With `timestamps`, yield parsed timestamps and values for binary output instead.
+    `time_range` is an optional (start, end) pair from parse_time_range.
+    """
+    for result in map_files(load_pollution_file, csv_files, city, pollutant, timestamps, time_range):
+        if result is not None:
+            yield result
+
+def resample_parts(parts, resolution, max_points):
+    """
+    Aggregate (year, {"timestamp", "value"}) parts to `resolution`, downsample to
+    at most `max_points` points and split the result back into (year, arrays)
+    parts. Besides the mean "value", the arrays hold "min", "max", "count", the
+    bucket "timestamp" and its "date" label.
+    """
+    timestamps = np.concatenate([part["timestamp"] for _, part in parts])
+    values = np.concatenate([part["value"] for _, part in parts])
+    
+    series = downsample(resample_series(timestamps, values, resolution), max_points)
+    resampled = split_by_year(series)
+    for _, part in resampled:
+        part["date"] = label_buckets(part["timestamp"], resolution)
+    return resampled
+
+def iter_resampled_columns(city, pollutant, csv_files, time_range, resolution, max_points):
+    """
+    Yield (year, arrays) of the city's series aggregated to `resolution` and
+    downsampled to at most `max_points` points (see resample_parts), with the
+    city center as coordinates.
+    """
+    parts = list(iter_pollution_columns(city, pollutant, csv_files, True, time_range))
+    if not parts:
+        return
+    
+    base_lat, base_lon = CITY_COORDS.get(city, (19.0, 72.8))  # Default to Mumbai center
+    for year, part in resample_parts(parts, resolution, max_points):
+        part["latitude"] = np.full(len(part["value"]), base_lat)
+        part["longitude"] = np.full(len(part["value"]), base_lon)
+        yield year, part
+
+def build_resampled_records(columns, year, city):
+    """Turn aggregated arrays into the list-of-objects response shape"""
+    return [
+        {
+            "date": date_value,
+            "year": year,
+            "latitude": lat,
+            "longitude": lon,
+            "value": value,
+            "min": min_value,
+            "max": max_value,
+            "count": count,
+            "city": city
+        }
+        for date_value, lat, lon, value, min_value, max_value, count in zip(
+            columns["date"],
+            columns["latitude"].tolist(),
+            columns["longitude"].tolist(),
+            columns["value"].tolist(),
+            columns["min"].tolist(),
+            columns["max"].tolist(),
+            columns["count"].tolist()
+        )
+    ]
+
+def check_response_format(fmt, shape=RECORDS_SHAPE):
+    """Reject unknown or incompatible values of the `format` and `shape` query parameters"""
+    if fmt != JSON_FORMAT and fmt not in STREAM_MEDIA_TYPES and fmt not in BINARY_MEDIA_TYPES:
+        allowed = ", ".join([JSON_FORMAT] + list(STREAM_MEDIA_TYPES) + list(BINARY_MEDIA_TYPES))
+        raise HTTPException(status_code=400, detail=f"Unknown format '{fmt}'. Use one of: {allowed}")
+    if fmt == "arrow" and not ARROW_AVAILABLE:
+        raise HTTPException(status_code=501, detail="format=arrow requires the pyarrow package")
+    if shape not in (RECORDS_SHAPE, COLUMNS_SHAPE):
+        raise HTTPException(status_code=400, detail=f"Unknown shape '{shape}'. Use records or columns")
+    if shape == COLUMNS_SHAPE and fmt != JSON_FORMAT:
+        raise HTTPException(status_code=400, detail="shape=columns is only available with format=json")
+
+def build_pollution_response(city, pollutant, csv_files, format, shape, include_coords, time_range, resolution, max_points):
+    """Load a city's series and build the /api/pollution-data response (blocking)"""
+    # Files are read lazily; stop at the first one that has data to detect a 404 early
+    if resolution != RAW_RESOLUTION or max_points:
+        parts = iter_resampled_columns(city, pollutant, csv_files, time_range, resolution, max_points)
+        to_records, extra_keys = build_resampled_records, AGGREGATE_KEYS
+    else:
+        parts = iter_pollution_columns(city, pollutant, csv_files, format in BINARY_MEDIA_TYPES, time_range)
+        to_records, extra_keys = build_pollution_records, ()
+    parts = peek_batches(parts)
+    if parts is None:
+        raise HTTPException(
+            status_code=404, 
+            detail=f"No data found for pollutant '{pollutant}' in city '{city}'"
+        )
+    
+    meta = {"city": city, "pollutant": pollutant, "resolution": resolution}
+    if format in BINARY_MEDIA_TYPES:
+        return binary_series_response(parts, format, meta)
+    
+    if shape == COLUMNS_SHAPE:
+        return columns_response(parts, meta, include_coords=include_coords, extra_keys=extra_keys)
+    
+    batches = (to_records(columns, year, city) for year, columns in parts)
+    if format in STREAM_MEDIA_TYPES:
+        return streaming_records_response(batches, format)
+    
+    # Combined data across all years, encoded here rather than on the event loop
+    all_data = [data_point for batch in batches for data_point in batch]
+    return JSONResponse({"data": all_data})
+
 @app.get("/api/pollution-data")
 async def get_pollution_data(
     city: str = Query(..., description="City name"),
-    pollutant: str = Query(..., description="Pollutant name")
+    pollutant: str = Query(..., description="Pollutant name"),
+    format: str = Query(JSON_FORMAT, description="Response format: json, ndjson, json-stream, f32 or arrow"),
+    shape: str = Query(RECORDS_SHAPE, description="records (list of objects) or columns (parallel arrays)"),
+    include_coords: bool = Query(False, description="With shape=columns, also return per-point coordinates"),
+    start: Optional[str] = Query(None, description="Only include points at or after this date/time (e.g. 2023-01-01)"),
+    end: Optional[str] = Query(None, description="Only include points up to this date (inclusive) or before this date/time"),
+    resolution: str = Query(RAW_RESOLUTION, description="raw, hour, day, week or month; aggregated points carry mean/min/max/count"),
+    max_points: Optional[int] = Query(None, ge=3, description="Downsample the series to at most this many points (LTTB)")
 ):
     """
-    Get pollution data for a specific city and pollutant across all available years
+    Get pollution data for a specific city and pollutant across all available years,
+    optionally limited to a start/end time range and resampled to a coarser resolution
     """
+    check_response_format(format, shape)
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown resolution '{resolution}'. Use one of: {', '.join(RESOLUTIONS)}")
+    try:
+        time_range = parse_time_range(start, end) if start or end else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time range: {str(e)}")
     city_dir = os.path.join(DATA_DIR, city)
     
     # Check if city exists
@@ -149,104 +465,269 @@ async def get_pollution_data(
     if not csv_files:
         raise HTTPException(status_code=404, detail=f"No data files found for city '{city}'")
     
-    # Combined data across all years
-    all_data = []
+    return await run_blocking(
+        build_pollution_response,
+        city, pollutant, csv_files, format, shape, include_coords, time_range, resolution, max_points
+    )
+
+def load_batch_file(csv_file, pollutants, time_range=None):
+    """
+    Read one file once and extract every requested pollutant from it.
+    Returns (year, {pollutant: {"timestamp", "value", "date"}}) or None. Runs on the loader pool.
+    """
+    # Skip files outside the requested range without opening them
+    if time_range and not TIME_INDEX.may_overlap(csv_file, *time_range):
+        return None
+    try:
+        year = os.path.basename(csv_file).split('.')[0]
+        
+        # Resolve every requested pollutant from the file header
+        schema = SCHEMA_INDEX.get(csv_file)
+        date_column = schema["date_column"]
+        found = {pollutant: schema["pollutants"][pollutant] for pollutant in pollutants if pollutant in schema["pollutants"]}
+        if not date_column or not found:
+            return None
+        
+        # One read with the union of the needed columns
+        df = read_dataset(csv_file, [date_column] + list(dict.fromkeys(found.values())))
+        dates = file_dates(csv_file, df, date_column)
+        if time_range:
+            rows = TIME_INDEX.select(csv_file, *time_range, load_dates=lambda: pd.Series(dates.timestamps))
+            df = df.iloc[rows]
+            dates = dates.take(rows)
+        
+        series = {}
+        for pollutant, column in found.items():
+            values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+            mask = ~np.isnan(values)
+            if mask.any():
+                series[pollutant] = {
+                    "timestamp": dates.timestamps[mask],
+                    "value": values[mask],
+                    "date": dates.labels[mask].tolist()
+                }
+    except Exception as e:
+        print(f"Error processing {csv_file}: {str(e)}")
+        return None
     
-    for csv_file in csv_files:
-        try:
-            # Extract year from filename
-            year = os.path.basename(csv_file).split('.')[0]
-            
-            # Read the CSV file
-            df = pd.read_csv(csv_file)
-            
-            # Find the actual column name for the requested pollutant
-            pollutant_col = find_pollutant_column(df, pollutant)
-            if not pollutant_col:
-                print(f"Pollutant '{pollutant}' not found in {csv_file}")
-                continue
-                
-            # Extract the date column
-            date_col = extract_date_column(df)
-            if not date_col:
-                print(f"Date column not found in {csv_file}")
+    return year, series
+
+def split_query_list(values):
+    """Accept both ?name=A&name=B and ?name=A,B; keep the first occurrence of each value"""
+    return list(dict.fromkeys(name.strip() for value in values or [] for name in value.split(",") if name.strip()))
+
+def build_batch_response(cities, pollutants, time_range, resolution, max_points):
+    """
+    Build the /api/pollution-batch response (blocking). Each city's files are
+    scanned once for all pollutants; results are keyed by city, then pollutant.
+    """
+    aggregated = resolution != RAW_RESOLUTION or bool(max_points)
+    extra_keys = AGGREGATE_KEYS if aggregated else ()
+    results = {}
+    missing = []
+    for city in cities:
+        csv_files = glob.glob(os.path.join(DATA_DIR, city, "*.csv"))
+        parts = {pollutant: [] for pollutant in pollutants}
+        for result in map_files(load_batch_file, csv_files, pollutants, time_range):
+            if result is None:
                 continue
-            
-            # Generate synthetic latitude/longitude based on city
-            # Default coordinates for each city (center point)
-            base_lat, base_lon = CITY_COORDS.get(city, (19.0, 72.8))  # Default to Mumbai center
-            
-            # Add small random variation for visualization
-            from random import uniform
-            
-            # Format data for response
-            file_data = []
-            for idx, row in df.iterrows():
-                try:
-                    # Check if pollutant value exists and is not NaN
-                    if pollutant_col in row and pd.notna(row[pollutant_col]):
-                        # Generate random coordinates around the city center
-                        lat = base_lat + uniform(-0.005, 0.005)
-                        lon = base_lon + uniform(-0.005, 0.005)
-                        
-                        # Ensure date is a string
-                        date_value = str(row[date_col]) if pd.notna(row[date_col]) else f"{year}-01-01"
-                        
-                        # Convert pollutant value to float, handling potential errors
-                        try:
-                            # First convert to string and then to float to handle various data types
-                            value_str = str(row[pollutant_col]).strip()
-                            # Skip empty strings, nan, or none values
-                            if value_str == '' or value_str.lower() == 'nan' or value_str.lower() == 'none':
-                                continue
-                            pollutant_value = float(value_str)
-                        except (ValueError, TypeError):
-                            print(f"Error converting pollutant value: {row[pollutant_col]}")
-                            continue
-                        
-                        # Create data point
-                        data_point = {
-                            "date": date_value,
-                            "year": year,
-                            "latitude": float(lat),
-                            "longitude": float(lon),
-                            "value": pollutant_value,
-                            "city": city  # Use the requested city name
-                        }
-                        file_data.append(data_point)
-                except Exception as row_error:
-                    print(f"Error processing row {idx}: {str(row_error)}")
-                    continue
-            
-            all_data.extend(file_data)
+            year, series = result
+            for pollutant, arrays in series.items():
+                parts[pollutant].append((year, arrays))
         
-        except Exception as e:
-            print(f"Error processing {csv_file}: {str(e)}")
-            # Continue to next file rather than failing completely
+        results[city] = {}
+        for pollutant, pollutant_parts in parts.items():
+            if not pollutant_parts:
+                missing.append({"city": city, "pollutant": pollutant})
+                continue
+            if aggregated:
+                pollutant_parts = resample_parts(pollutant_parts, resolution, max_points)
+            results[city][pollutant] = columns_payload(
+                pollutant_parts, {"resolution": resolution}, extra_keys=extra_keys
+            )
+    
+    meta = {"cities": cities, "pollutants": pollutants, "resolution": resolution, "missing": missing}
+    return JSONResponse({"meta": meta, "results": results})
+
+@app.get("/api/pollution-batch")
+async def get_pollution_batch(
+    cities: List[str] = Query(..., description="City names (repeat the parameter or separate with commas)"),
+    pollutants: List[str] = Query(..., description="Pollutant names (repeat the parameter or separate with commas)"),
+    start: Optional[str] = Query(None, description="Only include points at or after this date/time (e.g. 2023-01-01)"),
+    end: Optional[str] = Query(None, description="Only include points up to this date (inclusive) or before this date/time"),
+    resolution: str = Query(RAW_RESOLUTION, description="raw, hour, day, week or month; aggregated points carry mean/min/max/count"),
+    max_points: Optional[int] = Query(None, ge=3, description="Downsample each series to at most this many points (LTTB)")
+):
+    """
+    Get the series of several pollutants for several cities in one request.
+    Results use the shape=columns layout and are keyed by city, then pollutant.
+    """
+    cities = split_query_list(cities)
+    pollutants = split_query_list(pollutants)
+    if not cities or not pollutants:
+        raise HTTPException(status_code=400, detail="At least one city and one pollutant are required")
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown resolution '{resolution}'. Use one of: {', '.join(RESOLUTIONS)}")
+    try:
+        time_range = parse_time_range(start, end) if start or end else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time range: {str(e)}")
+    for city in cities:
+        if not os.path.exists(os.path.join(DATA_DIR, city)):
+            raise HTTPException(status_code=404, detail=f"City '{city}' not found")
+    
+    return await run_blocking(build_batch_response, cities, pollutants, time_range, resolution, max_points)
+
+def read_rollup_file(csv_file, date_column, column):
+    """Read one file's (timestamps, values) for the rollup store through the dataset and date caches"""
+    df = read_dataset(csv_file, [date_column, column])
+    values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+    return file_dates(csv_file, df, date_column).timestamps, values
+
+# Daily/monthly/yearly summaries per (city, pollutant), built on first use or by ingest.py
+ROLLUP_STORE = RollupStore(
+    DATA_DIR, lambda city, pollutant: load_city_series(DATA_DIR, city, pollutant, SCHEMA_INDEX, read_rollup_file)
+)
+
+@app.get("/api/summary")
+async def get_summary(
+    city: str = Query(..., description="City name"),
+    pollutant: str = Query(..., description="Pollutant name"),
+    period: str = Query("month", description="day, month or year"),
+    start: Optional[str] = Query(None, description="Only include periods starting at or after this date"),
+    end: Optional[str] = Query(None, description="Only include periods starting up to this date (inclusive)")
+):
+    """
+    Get precomputed mean/min/max/count and p50/p90/p95 values of a pollutant
+    per day, month or year, as parallel arrays
+    """
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail=f"Unknown period '{period}'. Use one of: {', '.join(PERIODS)}")
+    try:
+        time_range = parse_time_range(start, end) if start or end else (None, None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time range: {str(e)}")
+    # Both names end up in rollup file paths, so only accept known values
+    if city not in CATALOG.cities():
+        raise HTTPException(status_code=404, detail=f"City '{city}' not found")
+    if pollutant not in POLLUTANT_MAP:
+        raise HTTPException(status_code=404, detail=f"Pollutant '{pollutant}' not found")
     
-    if not all_data:
+    # The first request for a pair builds its rollups from the raw files
+    table = (await run_blocking(ROLLUP_STORE.get, city, pollutant))[period]
+    if len(table["timestamp"]) == 0:
         raise HTTPException(
             status_code=404, 
             detail=f"No data found for pollutant '{pollutant}' in city '{city}'"
         )
     
-    return {"data": all_data}
+    # Periods are sorted by start, so the range is two binary searches
+    range_start, range_end = time_range
+    lo = 0 if range_start is None else int(np.searchsorted(table["timestamp"], range_start, side="left"))
+    hi = len(table["timestamp"]) if range_end is None else int(np.searchsorted(table["timestamp"], range_end, side="left"))
+    hi = max(lo, hi)
+    
+    columns = {"date": table["date"][lo:hi]}
+    for stat in STATS:
+        columns[stat] = table[stat][lo:hi].tolist()
+    meta = {"city": city, "pollutant": pollutant, "period": period, "count": hi - lo}
+    return JSONResponse({"meta": meta, "columns": columns})
 
-# Base directory for FutureData folder
-FUTURE_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "FutureData") 
+# Report the FutureData directory
 print(f"FutureData directory: {FUTURE_DATA_DIR}")
 print(f"FutureData directory exists: {os.path.exists(FUTURE_DATA_DIR)}")
 
-# List of prediction model folders inside the FutureData directory
-MODEL_FOLDERS = ["LSTM", "RFR", "LGBM"]
-
 @app.get("/api/models")
 async def get_models():
     """Get list of all available prediction models"""
-    # Get the available model folders inside FutureData
-    models = [model for model in os.listdir(FUTURE_DATA_DIR) if os.path.isdir(os.path.join(FUTURE_DATA_DIR, model))]
-    return {"models": models}
+    # The model folders inside FutureData, from the catalog
+    return {"models": CATALOG.models()}
+
+
+def build_prediction_records(columns, year):
+    """Turn the arrays of one prediction file into the list-of-objects response shape"""
+    return [
+        {
+            "date": date_value,
+            "year": year,
+            "latitude": lat,
+            "longitude": lon,
+            "prediction_value": value,
+        }
+        for date_value, lat, lon, value in zip(
+            columns["date"],
+            columns["latitude"].tolist(),
+            columns["longitude"].tolist(),
+            columns["value"].tolist()
+        )
+    ]
+
+def iter_prediction_columns(model, city, emission_type, year, timestamps=False):
+    """
+    Yield (year, arrays) for the model's forecast file of the year if it has the
+    emission type, sliced from the prediction store. With `timestamps`, yield
+    timestamps and values for binary output instead.
+    """
+    series = PREDICTIONS.series(model, city, year, emission_type)
+    if series is None:
+        print(f"Emission type '{emission_type}' not found in {model}/{city} for {year}")
+        return
+    count = len(series["value"])
+    if count == 0:
+        return
+    
+    if timestamps:
+        yield year, {"timestamp": series["timestamp"], "value": series["value"]}
+        return
+    
+    latitude, longitude = scatter_coords(city, count)
+    yield year, {
+        "date": series["date"].tolist(),
+        "value": series["value"],
+        "latitude": latitude,
+        "longitude": longitude,
+    }
 
+def iter_prediction_batches(model, city, emission_type, year):
+    """Yield the prediction points of each matching file in turn"""
+    for extracted_year, columns in iter_prediction_columns(model, city, emission_type, year):
+        yield build_prediction_records(columns, extracted_year)
+
+def build_prediction_response(model, city, emission_type, year, format, shape, include_coords):
+    """Look up the forecast arrays and build the /api/prediction-data response (blocking)"""
+    # The store reloads the file first if it changed on disk
+    if PREDICTIONS.get(model, city, year) is None:
+        raise HTTPException(
+            status_code=404, 
+            detail=f"No data file found for year {year} in city '{city}' using model '{model}'"
+        )
+    
+    if format in BINARY_MEDIA_TYPES:
+        batches = peek_batches(iter_prediction_columns(model, city, emission_type, year, timestamps=True))
+    elif shape == COLUMNS_SHAPE:
+        batches = peek_batches(iter_prediction_columns(model, city, emission_type, year))
+    else:
+        batches = peek_batches(iter_prediction_batches(model, city, emission_type, year))
+    
+    # If no data was found, return an error
+    if batches is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No data found for emission type '{emission_type}' in model '{model}'"
+        )
+    
+    meta = {"model": model, "city": city, "emission_type": emission_type}
+    if format in BINARY_MEDIA_TYPES:
+        return binary_series_response(batches, format, meta)
+    
+    if shape == COLUMNS_SHAPE:
+        return columns_response(batches, meta, value_key="prediction_value", include_coords=include_coords)
+    
+    if format in STREAM_MEDIA_TYPES:
+        return streaming_records_response(batches, format)
+    
+    all_data = [data_point for batch in batches for data_point in batch]
+    return JSONResponse({"data": all_data})
 
 @app.get("/api/prediction-data")
 async def get_prediction_data(
@@ -254,10 +735,14 @@ async def get_prediction_data(
     city: str = Query(..., description="City name (e.g., Colaba)"),
     emission_type: str = Query(..., description="Type of emission (column name in CSV)"),
     year: str = Query(..., description="Year (e.g., 2025)"),
+    format: str = Query(JSON_FORMAT, description="Response format: json, ndjson, json-stream, f32 or arrow"),
+    shape: str = Query(RECORDS_SHAPE, description="records (list of objects) or columns (parallel arrays)"),
+    include_coords: bool = Query(False, description="With shape=columns, also return per-point coordinates")
 ):
     """
     Get prediction data for a specific model, emission type, and year.
     """
+    check_response_format(format, shape)
     model_dir = os.path.join(FUTURE_DATA_DIR, model, city)
     
     # Check if the model directory exists
@@ -270,105 +755,261 @@ async def get_prediction_data(
     if not os.path.exists(city_dir):
         raise HTTPException(status_code=404, detail=f"City '{city}' not found under model '{model}'")
     
-    # Match pattern for the model's predicted data
-    csv_pattern = os.path.join(city_dir, f"{model}_Predicted_{year}.csv")
-    csv_files = glob.glob(csv_pattern)
-    
-    # If no CSV file found, return 404
-    if not csv_files:
+    return await run_blocking(
+        build_prediction_response,
+        model, city, emission_type, year, format, shape, include_coords
+    )
+
+def build_prediction_comparison(city, emission_type, models, years):
+    """
+    Build the /api/prediction-compare response (blocking): each model's forecasts
+    over the years aligned on one date axis, with the ensemble statistics per date
+    """
+    series = []
+    missing = []
+    for model in models:
+        parts = []
+        for year in years:
+            arrays = PREDICTIONS.series(model, city, year, emission_type)
+            if arrays is None:
+                missing.append({"model": model, "year": year})
+                continue
+            parts.append(arrays)
+        series.append((
+            np.concatenate([part["timestamp"] for part in parts] or [np.empty(0, dtype="datetime64[ns]")]),
+            np.concatenate([part["value"] for part in parts] or [np.empty(0)])
+        ))
+    
+    dates, matrix = align_series(series)
+    if len(dates) == 0:
         raise HTTPException(
-            status_code=404, 
-            detail=f"No data file found for year {year} in city '{city}' using model '{model}'"
+            status_code=404,
+            detail=f"No data found for emission type '{emission_type}' in city '{city}'"
         )
     
-    all_data = []
-    
-    # Loop through all CSV files
-    for csv_file in csv_files:
-        try:
-            # Extract the year from the file name
-            filename = os.path.basename(csv_file)
-            extracted_year = filename.split("_")[-1].replace(".csv", "")
-            
-            # Read CSV file
-            df = pd.read_csv(csv_file)
-            print("Columns in CSV:", df.columns)
+    # Ensemble statistics over the models that have a value on each date
+    available = ~np.isnan(matrix)
+    count = available.sum(axis=0)
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # dates without any model
+        ensemble = {
+            "mean": np.nanmean(matrix, axis=0),
+            "spread": np.nanstd(matrix, axis=0),
+            "min": np.nanmin(matrix, axis=0),
+            "max": np.nanmax(matrix, axis=0),
+        }
+    
+    def to_list(values):
+        return [None if np.isnan(value) else value for value in values.tolist()]
+    
+    columns = {"date": label_buckets(dates, "day")}
+    columns["models"] = {model: to_list(row) for model, row in zip(models, matrix)}
+    columns.update({name: to_list(values) for name, values in ensemble.items()})
+    columns["count"] = count.tolist()
+    meta = {
+        "city": city,
+        "emission_type": emission_type,
+        "models": models,
+        "years": years,
+        "count": len(dates),
+        "missing": missing,
+    }
+    return JSONResponse({"meta": meta, "columns": columns})
 
-            # Check if the emission type exists in the columns
-            if emission_type not in df.columns:
-                print(f"Emission type '{emission_type}' not found in {csv_file}")
-                continue
-            
-            # Extract the date column
-            date_col = extract_date_column(df)
-            if not date_col:
-                print(f"Date column not found in {csv_file}")
+@app.get("/api/prediction-compare")
+async def get_prediction_compare(
+    city: str = Query(..., description="City name (e.g., Colaba)"),
+    emission_type: str = Query(..., description="Type of emission (column name in CSV)"),
+    models: Optional[List[str]] = Query(None, description="Models to compare (repeat or separate with commas; default: all)"),
+    years: Optional[List[str]] = Query(None, description="Years to include (repeat or separate with commas; default: all available)")
+):
+    """
+    Get the forecasts of several models and years for one emission type, aligned
+    by date as parallel arrays, with the ensemble mean, spread (standard
+    deviation), min, max and model count per date.
+    """
+    catalog_models = CATALOG.get()["models"]
+    models = split_query_list(models) or [
+        model for model in catalog_models if city in catalog_models[model]["cities"]
+    ]
+    for model in models:
+        if model not in catalog_models:
+            raise HTTPException(status_code=404, detail=f"Prediction model '{model}' not found.")
+    if not any(city in catalog_models[model]["cities"] for model in models):
+        raise HTTPException(status_code=404, detail=f"City '{city}' not found under any of the prediction models")
+    
+    years = split_query_list(years)
+    for year in years:
+        if not re.fullmatch(r"\d{4}", year):
+            raise HTTPException(status_code=400, detail=f"Invalid year '{year}'")
+    if not years:
+        # Every year that any of the models has a forecast for
+        years = sorted({
+            year
+            for model in models
+            for year in catalog_models[model]["cities"].get(city, {}).get("years", [])
+        })
+    
+    return await run_blocking(build_prediction_comparison, city, emission_type, models, years)
+
+def backtest_models(city):
+    """Return the models whose forecasts for a city overlap its observed data (from the catalog, without reading files)"""
+    document = CATALOG.get()
+    observed = document["cities"].get(city, {}).get("coverage", {})
+    if not observed.get("start") or not observed.get("end"):
+        return []
+    models = []
+    for model, entry in document["models"].items():
+        forecast = entry["cities"].get(city, {}).get("coverage", {})
+        if forecast.get("start") and forecast.get("end") and forecast["start"] <= observed["end"] and forecast["end"] >= observed["start"]:
+            models.append(model)
+    return models
+
+def compute_backtest(city):
+    """
+    Score every model's forecasts for a city against the observed daily means
+    (blocking). Returns {"observed", "forecasts", "scorecards"}.
+    """
+    catalog_models = CATALOG.get()["models"]
+    observed = {}
+    forecasts = {}
+    scorecards = []
+    for model in backtest_models(city):
+        years = catalog_models[model]["cities"][city]["years"]
+        files = [columns for columns in (PREDICTIONS.get(model, city, year) for year in years) if columns]
+        if not files:
+            continue
+        
+        # One series per forecast column over all the years of the run
+        series = {}
+        for columns in files:
+            for column, arrays in columns.items():
+                series.setdefault(column, []).append(arrays)
+        series = {
+            column: (np.concatenate([part["timestamp"] for part in parts]), np.concatenate([part["value"] for part in parts]))
+            for column, parts in series.items()
+        }
+        starts = [timestamps[~np.isnat(timestamps)].min() for timestamps, _ in series.values() if (~np.isnat(timestamps)).any()]
+        if not starts:
+            continue
+        # The run starts on its first forecast day, which has horizon 1
+        origin = min(starts) - np.timedelta64(1, "D")
+        forecasts[model] = coverage(np.concatenate([timestamps[~np.isnat(timestamps)] for timestamps, _ in series.values()]))
+        
+        for column, (timestamps, values) in series.items():
+            pollutant = forecast_pollutant(column, POLLUTANT_MAP)
+            if pollutant is None:
                 continue
-            
-            # Default city coordinates (can be extended or overridden as needed)
-            base_lat, base_lon = CITY_COORDS.get(city, (19.0, 72.8))  # Default to Mumbai center
-            
-            from random import uniform
-            file_data = []
-            
-            # Process rows in the dataframe
-            for idx, row in df.iterrows():
-                try:
-                    # Check if the emission type value exists
-                    if pd.notna(row[emission_type]):
-                        lat = base_lat + uniform(-0.005, 0.005)
-                        lon = base_lon + uniform(-0.005, 0.005)
-                        
-                        # Extract the date value
-                        date_value = str(row[date_col]) if pd.notna(row[date_col]) else f"{year}-01-01"
-                        
-                        try:
-                            # Convert emission type to a float, handle errors
-                            value_str = str(row[emission_type]).strip()
-                            if value_str == '' or value_str.lower() in ['nan', 'none']:
-                                continue
-                            emission_value = float(value_str)
-                        except (ValueError, TypeError):
-                            print(f"Error converting emission value: {row[emission_type]}")
-                            continue
-                        
-                        # Create the data point
-                        data_point = {
-                            "date": date_value,
-                            "year": extracted_year,
-                            "latitude": float(lat),
-                            "longitude": float(lon),
-                            "prediction_value": emission_value,
-                            
-                        }
-                        file_data.append(data_point)
-                except Exception as row_error:
-                    print(f"Error processing row {idx}: {str(row_error)}")
+            if pollutant not in observed:
+                table = ROLLUP_STORE.get(city, pollutant)["day"]
+                has_data = table["count"] > 0
+                observed[pollutant] = (table["timestamp"][has_data], table["mean"][has_data])
+            for score in score_forecast(timestamps, values, *observed[pollutant], origin):
+                if score["n"] == 0:
                     continue
-            
-            all_data.extend(file_data)
-        
-        except Exception as e:
-            print(f"Error processing {csv_file}: {str(e)}")
+                scorecards.append(dict({"model": model, "pollutant": pollutant, "column": column}, **score))
+    
+    observed_coverage = {pollutant: coverage(timestamps) for pollutant, (timestamps, _) in observed.items()}
+    return {"observed": observed_coverage, "forecasts": forecasts, "scorecards": scorecards}
+
+def cached_backtest(city):
+    """Return the backtest of a city, recomputed only when its observed or forecast files change"""
+    version = (city_version(DATA_DIR, city), PREDICTIONS.city_version(city))
+    return BACKTESTS.get_or_build((city, version), lambda: compute_backtest(city))
+
+def warm_backtests():
+    """Compute the backtest of every city whose forecasts overlap its observed data"""
+    for city in CATALOG.cities():
+        if not backtest_models(city):
             continue
+        try:
+            cached_backtest(city)
+        except Exception as e:
+            print(f"Error backtesting {city}: {str(e)}")
+
+@app.get("/api/backtest")
+async def get_backtest(
+    city: str = Query(..., description="City name (e.g., Colaba)"),
+    models: Optional[List[str]] = Query(None, description="Only these models (repeat or separate with commas; default: all)"),
+    pollutants: Optional[List[str]] = Query(None, description="Only these pollutants (repeat or separate with commas; default: all)"),
+    metric: str = Query("rmse", description="Metric used to pick the best model: mae, rmse, mape or bias (smallest absolute bias)")
+):
+    """
+    Get the accuracy (MAE, RMSE, MAPE, bias and matched days) of each model's
+    forecasts against the observed daily means, per pollutant and horizon,
+    with the best model per pollutant and horizon by the chosen metric.
+    """
+    if metric not in METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric '{metric}'. Use one of: {', '.join(METRICS)}")
+    if city not in CATALOG.cities():
+        raise HTTPException(status_code=404, detail=f"City '{city}' not found")
     
-    # If no data was found, return an error
-    if not all_data:
+    backtest = await run_blocking(cached_backtest, city)
+    models = split_query_list(models)
+    pollutants = split_query_list(pollutants)
+    scorecards = [
+        card for card in backtest["scorecards"]
+        if (not models or card["model"] in models) and (not pollutants or card["pollutant"] in pollutants)
+    ]
+    if not scorecards:
         raise HTTPException(
             status_code=404,
-            detail=f"No data found for emission type '{emission_type}' in model '{model}'"
+            detail=f"No forecast days of city '{city}' match observed data. Forecasts must cover observed "
+                   f"dates, e.g. hold recent data out with `python train_forecasts.py --cutoff YYYY-MM-DD`"
         )
     
-    return {"data": all_data}
+    meta = {
+        "city": city,
+        "horizons": [horizon_label(bucket) for bucket in HORIZON_BUCKETS],
+        "observed": backtest["observed"],
+        "forecasts": backtest["forecasts"],
+        "matched_days": sum(card["n"] for card in scorecards),
+    }
+    return JSONResponse({"meta": meta, "scorecards": scorecards, "best": best_models(scorecards, metric)})
 
-@app.get("/api/pollution-map")
-async def get_pollution_map(
-    city: str = Query(..., description="City name"),
-    pollutant: str = Query(..., description="Pollutant name")
-):
-    """
-    Get pollution map for a specific city and pollutant
-    """
+def load_map_points(csv_file, city, pollutant):
+    """Load the points of one of a city's files for the pollution map. Runs on the loader pool."""
+    try:
+        # Extract year from filename
+        year = os.path.basename(csv_file).split('.')[0]
+        
+        # Look up the pollutant column from the file header
+        schema = SCHEMA_INDEX.get(csv_file)
+        pollutant_col = schema["pollutants"].get(pollutant)
+        if not pollutant_col:
+            print(f"Pollutant '{pollutant}' not found in {csv_file}")
+            return []
+        
+        # Read only the date, pollutant and location columns
+        columns = [schema["date_column"], pollutant_col]
+        if schema["has_location"]:
+            columns += ['Latitude', 'Longitude']
+        df = read_dataset(csv_file, columns)
+            
+        # Extract the date column
+        dates = file_dates(csv_file, df, schema["date_column"]) if schema["date_column"] else None
+        date_col = extract_date_column(df, dates)
+        if not date_col:
+            print(f"Date column not found in {csv_file}")
+            return []
+        
+        # Without location data, points are scattered around the city center for visualization
+        points = build_series_columns(df, pollutant_col, date_col, f"{year}-01-01", city, jitter=0.002)
+        if points is None:
+            return []
+        if 'Latitude' in df.columns and 'Longitude' in df.columns:
+            mask = pd.to_numeric(df[pollutant_col], errors='coerce').notna().to_numpy()
+            points["latitude"] = df['Latitude'].to_numpy(dtype=float)[mask]
+            points["longitude"] = df['Longitude'].to_numpy(dtype=float)[mask]
+        return build_pollution_records(points, year, city)
+    
+    except Exception as e:
+        print(f"Error processing {csv_file}: {str(e)}")
+        # Continue to next file rather than failing completely
+        return []
+
+def render_pollution_map(city, pollutant):
+    """Build the pollution map HTML for /api/pollution-map (blocking)"""
     city_dir = os.path.join(DATA_DIR, city)
     
     # Check if city exists
@@ -383,73 +1024,8 @@ async def get_pollution_map(
     # Combined data across all years
     all_data = []
     
-    for csv_file in csv_files:
-        try:
-            # Extract year from filename
-            year = os.path.basename(csv_file).split('.')[0]
-            
-            # Read the CSV file
-            df = pd.read_csv(csv_file)
-            
-            # Find the actual column name for the requested pollutant
-            pollutant_col = find_pollutant_column(df, pollutant)
-            if not pollutant_col:
-                print(f"Pollutant '{pollutant}' not found in {csv_file}")
-                continue
-                
-            # Extract the date column
-            date_col = extract_date_column(df)
-            if not date_col:
-                print(f"Date column not found in {csv_file}")
-                continue
-            
-            # Extract or generate latitude/longitude if available
-            lat_col = 'Latitude' if 'Latitude' in df.columns else None
-            lon_col = 'Longitude' if 'Longitude' in df.columns else None
-            
-            # If location data is missing, generate fake coordinates based on city
-            if not lat_col or not lon_col:
-                # Default coordinates for each city (center point)
-                city_coords = {
-                    'Byculla': (18.9794, 72.8368),
-                    'Colaba': (18.9100, 72.8050),
-                    'CSMT Airport': (18.9400, 72.8350),
-                    'Mazgaon': (18.9600, 72.8450),
-                    'Sion': (19.0390, 72.8619),
-                    'Worli': (18.9925, 72.8175)
-                }
-                
-                # Add small random variation for visualization
-                from random import uniform
-                base_lat, base_lon = city_coords.get(city, (19.0, 72.8))  # Default to Mumbai center
-                
-                # Create synthetic latitude and longitude columns
-                df['Latitude'] = [base_lat + uniform(-0.002, 0.002) for _ in range(len(df))]
-                df['Longitude'] = [base_lon + uniform(-0.002, 0.002) for _ in range(len(df))]
-                
-                lat_col = 'Latitude'
-                lon_col = 'Longitude'
-            
-            # Format data for response
-            file_data = []
-            for _, row in df.iterrows():
-                if pd.notna(row[pollutant_col]):  # Check if pollutant value is not NaN
-                    # Create data point
-                    data_point = {
-                        "date": row[date_col],
-                        "year": year,
-                        "latitude": float(row[lat_col]),
-                        "longitude": float(row[lon_col]),
-                        "value": float(row[pollutant_col]),
-                        "city": city  # Use the requested city name
-                    }
-                    file_data.append(data_point)
-            
-            all_data.extend(file_data)
-        
-        except Exception as e:
-            print(f"Error processing {csv_file}: {str(e)}")
-            # Continue to next file rather than failing completely
+    for file_data in map_files(load_map_points, csv_files, city, pollutant):
+        all_data.extend(file_data)
     
     if not all_data:
         raise HTTPException(
@@ -492,305 +1068,253 @@ async def get_pollution_map(
     map_html = m._repr_html_()
     return map_html
 
-@app.get("/api/folium-map", response_class=HTMLResponse)
-async def get_folium_map(
+@app.get("/api/pollution-map")
+async def get_pollution_map(
     city: str = Query(..., description="City name"),
-    pollutant: str = Query(..., description="Pollutant name"),
-    show_markers: bool = Query(True, description="Whether to show location markers")
+    pollutant: str = Query(..., description="Pollutant name")
 ):
     """
-    Generate a Leaflet map for the specified city and pollutant with a single pointer
+    Get pollution map for a specific city and pollutant
     """
-    try:
-        print(f"Generating map for city: {city}, pollutant: {pollutant}")
-        
-        # Get pollution data directly from CSV files instead of using the API endpoint
-        city_dir = os.path.join(DATA_DIR, city)
-        if not os.path.exists(city_dir):
-            return f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; padding: 20px; text-align: center;">
-                <h3 style="color: #d9534f;">City Not Found</h3>
-                <p>The city '{city}' was not found in the data directory.</p>
-            </body>
-            </html>
-            """
-        
-        # Get all CSV files for the city
-        csv_files = glob.glob(os.path.join(city_dir, "*.csv"))
-        if not csv_files:
-            return f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; padding: 20px; text-align: center;">
-                <h3 style="color: #d9534f;">No Data Files</h3>
-                <p>No data files found for city '{city}'.</p>
-            </body>
-            </html>
-            """
-        
-        # Process data directly
-        heat_data = []
-        # Get exact coordinates for the city from the CITY_COORDS dictionary
-        base_lat, base_lon = CITY_COORDS.get(city, (19.0, 72.8))  # Default to Mumbai center
-        
-        # Create a grid of locations across the area
-        from random import uniform, gauss, seed
-        
-        # Set a seed for reproducibility but make it different for each city/pollutant
-        seed_value = hash(f"{city}_{pollutant}") % 10000
-        seed(seed_value)
-        
-        # Define the area bounds (approximately 2km in each direction)
-        lat_range = 0.02  # About 2km north-south
-        lon_range = 0.02  # About 2km east-west
-        
-        # Create 20-30 scattered data points across the area
-        num_points = 25 + int(uniform(0, 10))
-        
-        # Process each CSV file to get average pollutant values
-        pollutant_values = []
-        
-        for csv_file in csv_files:
-            try:
-                # Read the CSV file
-                df = pd.read_csv(csv_file)
-                
-                # Find the pollutant column
-                pollutant_col = find_pollutant_column(df, pollutant)
-                if not pollutant_col:
-                    continue
-                
-                # Get valid pollutant values
-                valid_values = df[pollutant_col].dropna().tolist()
-                
-                # Convert values to float, handling potential errors
-                for val in valid_values:
-                    try:
-                        value_str = str(val).strip()
-                        if value_str == '' or value_str.lower() == 'nan' or value_str.lower() == 'none':
-                            continue
-                        pollutant_values.append(float(value_str))
-                    except (ValueError, TypeError) as e:
-                        print(f"Error converting pollutant value: {val}, {str(e)}")
-                
-            except Exception as file_error:
-                print(f"Error processing file {csv_file}: {str(file_error)}")
-        
-        if not pollutant_values:
-            return f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; padding: 20px; text-align: center;">
-                <h3 style="color: #d9534f;">No Data Found</h3>
-                <p>No valid pollution data found for {pollutant} in {city}.</p>
-            </body>
-            </html>
-            """
-        
-        # Calculate statistics for the pollutant values
-        min_val = min(pollutant_values)
-        max_val = max(pollutant_values)
-        avg_val = sum(pollutant_values) / len(pollutant_values)
-        
-        # Create data points for heatmap
-        for i in range(num_points):
-            # Create a scattered point with Gaussian distribution around the center
-            lat = base_lat + gauss(0, lat_range/3)
-            lon = base_lon + gauss(0, lon_range/3)
+    return await run_blocking(render_pollution_map, city, pollutant)
+
+def build_folium_html(city, pollutant, show_markers, window="all"):
+    """Build the heatmap HTML for /api/folium-map. Raises on unexpected errors."""
+    print(f"Generating map for city: {city}, pollutant: {pollutant}")
+    
+    # Get pollution data directly from CSV files instead of using the API endpoint
+    city_dir = os.path.join(DATA_DIR, city)
+    if not os.path.exists(city_dir):
+        return f"""
+        <html>
+        <body style="font-family: Arial, sans-serif; padding: 20px; text-align: center;">
+            <h3 style="color: #d9534f;">City Not Found</h3>
+            <p>The city '{city}' was not found in the data directory.</p>
+        </body>
+        </html>
+        """
+    
+    # Get all CSV files for the city
+    csv_files = glob.glob(os.path.join(city_dir, "*.csv"))
+    if not csv_files:
+        return f"""
+        <html>
+        <body style="font-family: Arial, sans-serif; padding: 20px; text-align: center;">
+            <h3 style="color: #d9534f;">No Data Files</h3>
+            <p>No data files found for city '{city}'.</p>
+        </body>
+        </html>
+        """
+    
+    # Get exact coordinates for the city from the CITY_COORDS dictionary
+    base_lat, base_lon = CITY_COORDS.get(city, (19.0, 72.8))  # Default to Mumbai center
+    
+    # Define the area shown around the city (approximately 2km in each direction)
+    lat_range = 0.02  # About 2km north-south
+    lon_range = 0.02  # About 2km east-west
+    
+    # Mean of the pollutant at this station over the window, from the rollups
+    avg_val = station_window_value(city, pollutant, window)
+    grid = interpolated_grid(pollutant, window)
+    station_values = [value for value in grid["stations"].values() if value is not None]
+    
+    if avg_val is None or not station_values:
+        period_text = "" if window == "all" else f" for {window}"
+        return f"""
+        <html>
+        <body style="font-family: Arial, sans-serif; padding: 20px; text-align: center;">
+            <h3 style="color: #d9534f;">No Data Found</h3>
+            <p>No valid pollution data found for {pollutant} in {city}{period_text}.</p>
+        </body>
+        </html>
+        """
+    
+    # Heat points are the interpolated grid cells around the city, scaled to
+    # 0.1-1 by the range of the station values so that cities compare on one scale
+    lats, lons, values = grid["lats"], grid["lons"], grid["values"]
+    shown = (np.abs(lats - base_lat) <= lat_range) & (np.abs(lons - base_lon) <= lon_range) & np.isfinite(values)
+    low, high = min(station_values), max(station_values)
+    if high > low:
+        intensity = np.clip((values[shown] - low) / (high - low), 0.1, 1.0)
+    else:
+        intensity = np.full(int(shown.sum()), 0.5)
+    heat_data = np.column_stack([
+        np.round(lats[shown], 5), np.round(lons[shown], 5), np.round(intensity, 3)
+    ]).tolist()
+    
+    # Create a Leaflet map HTML
+    leaflet_html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="utf-8">
+        <title>{city} - {pollutant} Heatmap</title>
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css" integrity="sha256-p4NxAoJBhIIN+hmNHrzRCf9tD/miZyoHS5obTRR9BMY=" crossorigin=""/>
+        <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js" integrity="sha256-20nQCchB9co0qIjJZRGuk2/Z9VM+kNiyxNV1lvTlZBo=" crossorigin=""></script>
+        <script src="https://unpkg.com/leaflet.heat@0.2.0/dist/leaflet-heat.js"></script>
+        <style>
+            html, body, #map {{
+                height: 100%;
+                width: 100%;
+                margin: 0;
+                padding: 0;
+            }}
+            .info {{
+                padding: 6px 8px;
+                font: 14px/16px Arial, Helvetica, sans-serif;
+                background: white;
+                background: rgba(255,255,255,0.8);
+                box-shadow: 0 0 15px rgba(0,0,0,0.2);
+                border-radius: 5px;
+            }}
+            .info h4 {{
+                margin: 0 0 5px;
+                color: #777;
+            }}
+            .legend {{
+                line-height: 18px;
+                color: #555;
+            }}
+            .legend i {{
+                width: 18px;
+                height: 18px;
+                float: left;
+                margin-right: 8px;
+                opacity: 0.7;
+            }}
+        </style>
+    </head>
+    <body>
+        <div id="map"></div>
+        <script>
+            // Initialize the map
+            var map = L.map('map').setView([{base_lat}, {base_lon}], 14);
             
-            # Assign a value based on distance from center and random variation
-            distance_from_center = ((lat - base_lat)**2 + (lon - base_lon)**2)**0.5
-            normalized_distance = min(1.0, distance_from_center / (lat_range/2))
+            // Add the base tile layer
+            L.tileLayer('https://{{s}}.tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png', {{
+                attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
+            }}).addTo(map);
             
-            # Value decreases with distance from center, with some randomness
-            value_factor = 1.0 - (normalized_distance * 0.7) + uniform(-0.2, 0.2)
-            value_factor = max(0.1, min(1.0, value_factor))  # Clamp between 0.1 and 1.0
+            // Heat map data
+            var heatData = {heat_data};
             
-            # Calculate the actual value
-            value = min_val + value_factor * (max_val - min_val)
+            // Add the heat map layer
+            var heat = L.heatLayer(heatData, {{
+                max: 1.0,
+                radius: 15,
+                blur: 20,
+                maxZoom: 17,
+                gradient: {{
+                    0.0: 'blue',
+                    0.25: 'lime',
+                    0.5: 'yellow',
+                    0.75: 'orange',
+                    1.0: 'red'
+                }}
+            }}).addTo(map);
             
-            # Add to heat data
-            heat_data.append([lat, lon, value])
-        
-        # Add more variation by creating smaller clusters
-        num_clusters = 3 + int(uniform(0, 4))
-        for _ in range(num_clusters):
-            # Create a cluster center
-            cluster_lat = base_lat + uniform(-lat_range/2, lat_range/2)
-            cluster_lon = base_lon + uniform(-lon_range/2, lon_range/2)
+            // Add ONLY ONE MARKER for the city's exact location
+            // Create a marker for the city center only
+            var cityMarker = L.marker([{base_lat}, {base_lon}]);
+            cityMarker.bindPopup('<b>{city}</b><br>Location: {base_lat}, {base_lon}<br>Average {pollutant}: ' + 
+                               {avg_val}.toFixed(2));
+            cityMarker.addTo(map);
             
-            # Determine cluster intensity (higher or lower than average)
-            cluster_intensity = uniform(0.7, 1.3)
+            // Create a pulsing icon effect for better visibility
+            function pulseMarker() {{
+                cityMarker._icon.style.transform += ' scale(1.1)';
+                setTimeout(function() {{
+                    if (cityMarker._icon) {{
+                        cityMarker._icon.style.transform = cityMarker._icon.style.transform.replace(' scale(1.1)', '');
+                    }}
+                }}, 500);
+            }}
             
-            # Add 5-10 points around this cluster
-            cluster_points = 5 + int(uniform(0, 6))
-            for _ in range(cluster_points):
-                point_lat = cluster_lat + gauss(0, lat_range/10)
-                point_lon = cluster_lon + gauss(0, lon_range/10)
-                
-                # Calculate value with some randomness
-                value = avg_val * cluster_intensity * uniform(0.8, 1.2)
-                value = max(min_val, min(max_val, value))  # Clamp to min/max range
-                
-                heat_data.append([point_lat, point_lon, value])
-        
-        # Create a Leaflet map HTML
-        leaflet_html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <title>{city} - {pollutant} Heatmap</title>
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css" integrity="sha256-p4NxAoJBhIIN+hmNHrzRCf9tD/miZyoHS5obTRR9BMY=" crossorigin=""/>
-            <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js" integrity="sha256-20nQCchB9co0qIjJZRGuk2/Z9VM+kNiyxNV1lvTlZBo=" crossorigin=""></script>
-            <script src="https://unpkg.com/leaflet.heat@0.2.0/dist/leaflet-heat.js"></script>
-            <style>
-                html, body, #map {{
-                    height: 100%;
-                    width: 100%;
-                    margin: 0;
-                    padding: 0;
-                }}
-                .info {{
-                    padding: 6px 8px;
-                    font: 14px/16px Arial, Helvetica, sans-serif;
-                    background: white;
-                    background: rgba(255,255,255,0.8);
-                    box-shadow: 0 0 15px rgba(0,0,0,0.2);
-                    border-radius: 5px;
-                }}
-                .info h4 {{
-                    margin: 0 0 5px;
-                    color: #777;
-                }}
-                .legend {{
-                    line-height: 18px;
-                    color: #555;
-                }}
-                .legend i {{
-                    width: 18px;
-                    height: 18px;
-                    float: left;
-                    margin-right: 8px;
-                    opacity: 0.7;
+            // Pulse the marker initially
+            setTimeout(pulseMarker, 1000);
+            
+            
+            // Add click handler to show coordinates when clicking on the map
+            map.on('click', function(e) {{
+                L.popup()
+                    .setLatLng(e.latlng)
+                    .setContent("Clicked location:<br>Lat: " + e.latlng.lat.toFixed(6) + 
+                              "<br>Lng: " + e.latlng.lng.toFixed(6))
+                    .openOn(map);
+                    
+                // Send click coordinates to parent window
+                try {{
+                    window.parent.postMessage({{
+                        type: 'map-click',
+                        lat: e.latlng.lat,
+                        lng: e.latlng.lng
+                    }}, '*');
+                }} catch(e) {{
+                    console.log('Error sending message to parent:', e);
                 }}
-            </style>
-        </head>
-        <body>
-            <div id="map"></div>
-            <script>
-                // Initialize the map
-                var map = L.map('map').setView([{base_lat}, {base_lon}], 14);
-                
-                // Add the base tile layer
-                L.tileLayer('https://{{s}}.tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png', {{
-                    attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
-                }}).addTo(map);
-                
-                // Heat map data
-                var heatData = {heat_data};
-                
-                // Add the heat map layer
-                var heat = L.heatLayer(heatData, {{
-                    radius: 15,
-                    blur: 20,
-                    maxZoom: 17,
-                    gradient: {{
-                        0.0: 'blue',
-                        0.25: 'lime',
-                        0.5: 'yellow',
-                        0.75: 'orange',
-                        1.0: 'red'
-                    }}
-                }}).addTo(map);
+            }});
+            
+            // Add a title control
+            var info = L.control();
+            
+            info.onAdd = function(map) {{
+                this._div = L.DomUtil.create('div', 'info');
+                this.update();
+                return this._div;
+            }};
+            
+            info.update = function() {{
+                this._div.innerHTML = '<h4>{city} - {pollutant} Levels</h4>';
+            }};
+            
+            info.addTo(map);
+            
+            // Add a legend
+            var legend = L.control({{position: 'bottomright'}});
+            
+            legend.onAdd = function(map) {{
+                var div = L.DomUtil.create('div', 'info legend');
+                var grades = ['Very Low', 'Low', 'Medium', 'High', 'Very High'];
+                var colors = ['blue', 'lime', 'yellow', 'orange', 'red'];
                 
-                // Add ONLY ONE MARKER for the city's exact location
-                // Create a marker for the city center only
-                var cityMarker = L.marker([{base_lat}, {base_lon}]);
-                cityMarker.bindPopup('<b>{city}</b><br>Location: {base_lat}, {base_lon}<br>Average {pollutant}: ' + 
-                                   {avg_val}.toFixed(2));
-                cityMarker.addTo(map);
+                div.innerHTML = '<h4>Pollution Levels</h4>';
                 
-                // Create a pulsing icon effect for better visibility
-                function pulseMarker() {{
-                    cityMarker._icon.style.transform += ' scale(1.1)';
-                    setTimeout(function() {{
-                        if (cityMarker._icon) {{
-                            cityMarker._icon.style.transform = cityMarker._icon.style.transform.replace(' scale(1.1)', '');
-                        }}
-                    }}, 500);
+                // Loop through our density intervals and generate a label with a colored square for each interval
+                for (var i = 0; i < grades.length; i++) {{
+                    div.innerHTML +=
+                        '<i style="background:' + colors[i] + '"></i> ' +
+                        grades[i] + '<br>';
                 }}
                 
-                // Pulse the marker initially
-                setTimeout(pulseMarker, 1000);
-                
-                
-                // Add click handler to show coordinates when clicking on the map
-                map.on('click', function(e) {{
-                    L.popup()
-                        .setLatLng(e.latlng)
-                        .setContent("Clicked location:<br>Lat: " + e.latlng.lat.toFixed(6) + 
-                                  "<br>Lng: " + e.latlng.lng.toFixed(6))
-                        .openOn(map);
-                        
-                    // Send click coordinates to parent window
-                    try {{
-                        window.parent.postMessage({{
-                            type: 'map-click',
-                            lat: e.latlng.lat,
-                            lng: e.latlng.lng
-                        }}, '*');
-                    }} catch(e) {{
-                        console.log('Error sending message to parent:', e);
-                    }}
-                }});
-                
-                // Add a title control
-                var info = L.control();
-                
-                info.onAdd = function(map) {{
-                    this._div = L.DomUtil.create('div', 'info');
-                    this.update();
-                    return this._div;
-                }};
-                
-                info.update = function() {{
-                    this._div.innerHTML = '<h4>{city} - {pollutant} Levels</h4>';
-                }};
-                
-                info.addTo(map);
-                
-                // Add a legend
-                var legend = L.control({{position: 'bottomright'}});
-                
-                legend.onAdd = function(map) {{
-                    var div = L.DomUtil.create('div', 'info legend');
-                    var grades = ['Very Low', 'Low', 'Medium', 'High', 'Very High'];
-                    var colors = ['blue', 'lime', 'yellow', 'orange', 'red'];
-                    
-                    div.innerHTML = '<h4>Pollution Levels</h4>';
-                    
-                    // Loop through our density intervals and generate a label with a colored square for each interval
-                    for (var i = 0; i < grades.length; i++) {{
-                        div.innerHTML +=
-                            '<i style="background:' + colors[i] + '"></i> ' +
-                            grades[i] + '<br>';
-                    }}
-                    
-                    return div;
-                }};
-                
-                legend.addTo(map);
-            </script>
-        </body>
-        </html>
-        """
-        
-        return leaflet_html
-        
+                return div;
+            }};
+            
+            legend.addTo(map);
+        </script>
+    </body>
+    </html>
+    """
+    
+    return leaflet_html
+    
+def render_folium_map(city, pollutant, show_markers, window="all"):
+    """
+    Return (html, etag) for /api/folium-map (blocking). Pages are cached per
+    (city, pollutant, show_markers, window) and data version, so repeat loads skip rendering.
+    """
+    try:
+        # The heat points are interpolated from every station, so the page
+        # changes whenever one of the stations' files is modified
+        cities, _ = station_index()
+        version = tuple(city_version(DATA_DIR, name) for name in sorted(set(cities) | {city})
+                        if os.path.isdir(os.path.join(DATA_DIR, name)))
+        key = (city, pollutant, show_markers, window, version)
+        return MAP_CACHE.get_or_render(key, lambda: build_folium_html(city, pollutant, show_markers, window))
+    
     except Exception as e:
         print(f"Error generating map: {str(e)}")
-        return f"""
+        html = f"""
         <html>
         <body style="font-family: Arial, sans-serif; padding: 20px; text-align: center;">
             <h3 style="color: #d9534f;">Error Generating Map</h3>
@@ -799,94 +1323,326 @@ async def get_folium_map(
         </body>
         </html>
         """
+        # Error pages are not cached
+        return html, None
+
+@app.get("/api/folium-map", response_class=HTMLResponse)
+async def get_folium_map(
+    request: Request,
+    city: str = Query(..., description="City name"),
+    pollutant: str = Query(..., description="Pollutant name"),
+    show_markers: bool = Query(True, description="Whether to show location markers"),
+    window: str = Query("all", description="all, or a year (YYYY), month (YYYY-MM) or day (YYYY-MM-DD)")
+):
+    """
+    Generate a Leaflet map for the specified city and pollutant with a single pointer.
+    The heat layer is interpolated (IDW) from the station means over the window.
+    Supports If-None-Match: an unchanged page is answered with 304 Not Modified.
+    """
+    try:
+        window_period(window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    html, etag = await run_blocking(render_folium_map, city, pollutant, show_markers, window)
+    if etag is None:
+        return HTMLResponse(html)
+    
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(html, headers=headers)
 
 # Add this new endpoint
 
-@app.get("/api/location-info")
-async def get_location_info(
-    lat: float = Query(..., description="Latitude of the location"),
-    lon: float = Query(..., description="Longitude of the location"),
-    city: str = Query(None, description="City name to filter data"),
-    pollutant: str = Query(None, description="Pollutant name to filter data"),
-    radius: float = Query(0.002, description="Search radius in degrees")
+def load_location_samples(csv_file, pollutant):
+    """
+    Return the located measurements of a pollutant in one file as arrays
+    (latitude, longitude, value, date, year), or None. Only files with location
+    columns have any. Runs on the loader pool.
+    """
+    try:
+        # Extract year from filename
+        year = os.path.basename(csv_file).split('.')[0]
+        
+        # Find the pollutant column from the file header
+        schema = SCHEMA_INDEX.get(csv_file)
+        pollutant_col = schema["pollutants"].get(pollutant)
+        
+        # Check if location data exists; otherwise the file is never read
+        if not pollutant_col or not schema["has_location"]:
+            return None
+        
+        columns = [pollutant_col, 'Latitude', 'Longitude']
+        if 'Date' in schema["columns"]:
+            columns.append('Date')
+        df = read_dataset(csv_file, columns)
+        
+        latitude = pd.to_numeric(df['Latitude'], errors='coerce').to_numpy(dtype=np.float64)
+        longitude = pd.to_numeric(df['Longitude'], errors='coerce').to_numpy(dtype=np.float64)
+        values = pd.to_numeric(df[pollutant_col], errors='coerce').to_numpy(dtype=np.float64)
+        mask = ~np.isnan(values) & ~np.isnan(latitude) & ~np.isnan(longitude)
+        if 'Date' in df.columns:
+            dates = df['Date'].astype(str).to_numpy(dtype=object)[mask]
+        else:
+            dates = np.full(int(mask.sum()), f"{year}-01-01", dtype=object)
+        return {
+            "latitude": latitude[mask],
+            "longitude": longitude[mask],
+            "value": values[mask],
+            "date": dates,
+            "year": np.full(int(mask.sum()), year, dtype=object),
+        }
+    
+    except Exception as e:
+        print(f"Error processing file {csv_file}: {str(e)}")
+        return None
+
+def sample_index(city, pollutant):
+    """
+    Return (samples, SpatialIndex) over the located measurements of a city,
+    rebuilt when the city's files change
+    """
+    version = city_version(DATA_DIR, city)
+    key = (city, pollutant)
+    entry = SAMPLE_INDEXES.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1], entry[2]
+    
+    csv_files = glob.glob(os.path.join(DATA_DIR, city, "*.csv"))
+    parts = [part for part in map_files(load_location_samples, csv_files, pollutant) if part is not None]
+    names = ("latitude", "longitude", "value", "date", "year")
+    if parts:
+        samples = {name: np.concatenate([part[name] for part in parts]) for name in names}
+    else:
+        samples = {name: np.empty(0) for name in names}
+    index = SpatialIndex(samples["latitude"], samples["longitude"], cell_deg=0.005)
+    SAMPLE_INDEXES[key] = (version, samples, index)
+    return samples, index
+
+def station_index():
+    """Return (cities, SpatialIndex) over the center coordinates of every known city"""
+    global STATION_INDEX
+    cities = tuple(city for city in CATALOG.cities() if city in CITY_COORDS)
+    if STATION_INDEX is None or STATION_INDEX[0] != cities:
+        lats = [CITY_COORDS[city][0] for city in cities]
+        lons = [CITY_COORDS[city][1] for city in cities]
+        STATION_INDEX = (cities, SpatialIndex(lats, lons))
+    return STATION_INDEX
+
+def station_average(city, pollutant):
+    """Average of a pollutant over all of a city's data, from the yearly rollups"""
+    if pollutant not in POLLUTANT_MAP:
+        return None
+    table = ROLLUP_STORE.get(city, pollutant)["year"]
+    total = int(table["count"].sum())
+    return float((table["mean"] * table["count"]).sum() / total) if total else None
+
+def station_window_value(city, pollutant, window="all"):
+    """Mean of a pollutant at a station over a window, from the rollups (None without data)"""
+    if pollutant not in POLLUTANT_MAP:
+        return None
+    period, start = window_period(window)
+    if period is None:
+        return station_average(city, pollutant)
+    table = ROLLUP_STORE.get(city, pollutant)[period]
+    # Periods are sorted by start, so the window is one binary search
+    i = int(np.searchsorted(table["timestamp"], start))
+    if i < len(table["timestamp"]) and table["timestamp"][i] == start and table["count"][i] > 0:
+        return float(table["mean"][i])
+    return None
+
+def station_grid():
+    """
+    Return (cities, bounds, lats, lons, shape, weights): the grid cells around all
+    stations and their IDW weights, rebuilt only when the set of stations changes
+    """
+    global STATION_GRID
+    cities, _ = station_index()
+    if STATION_GRID is None or STATION_GRID[0] != cities:
+        station_lats = [CITY_COORDS[city][0] for city in cities]
+        station_lons = [CITY_COORDS[city][1] for city in cities]
+        bounds = station_bounds(station_lats, station_lons)
+        shape = grid_shape(*bounds)
+        lats, lons = make_grid(*bounds, *shape)
+        STATION_GRID = (cities, bounds, lats, lons, shape, idw_weights(lats, lons, station_lats, station_lons))
+    return STATION_GRID
+
+def interpolated_grid(pollutant, window="all"):
+    """
+    Return the IDW grid of a pollutant over a window as {"lats", "lons", "values",
+    "shape", "stations"}, cached per (pollutant, window) and the stations' data versions
+    """
+    cities, _, lats, lons, shape, weights = station_grid()
+    version = tuple(city_version(DATA_DIR, city) for city in cities)
+    
+    def build():
+        stations = {city: station_window_value(city, pollutant, window) for city in cities}
+        values = interpolate(weights, [np.nan if value is None else value for value in stations.values()])
+        return {"lats": lats, "lons": lons, "values": values, "shape": shape, "stations": stations}
+    
+    return GRID_CACHE.get_or_build((pollutant, window, version), build)
+
+def build_heatmap_frames(pollutant, starts, period, dtype):
+    """
+    Interpolate one grid per period start and encode the stack (blocking). All
+    frames come from a single product of the IDW weights with the station means.
+    """
+    cities, bounds, _, _, shape, weights = station_grid()
+    station_values = np.stack([
+        align_station_values(ROLLUP_STORE.get(city, pollutant)[period], starts)
+        for city in cities
+    ])
+    # (cells x frames) -> frames x rows x cols
+    frames = interpolate(weights, station_values).T.reshape(len(starts), *shape)
+    south, west, north, east = bounds
+    header = {
+        "pollutant": pollutant,
+        "period": period,
+        "bounds": {"south": south, "west": west, "north": north, "east": east},
+        "frames": label_buckets(starts, period),
+        "stations": [
+            {"city": city, "lat": CITY_COORDS[city][0], "lon": CITY_COORDS[city][1],
+             "values": [None if np.isnan(value) else round(float(value), 3) for value in values]}
+            for city, values in zip(cities, station_values)
+        ],
+    }
+    return encode_frames(frames, header, dtype)
+
+def render_heatmap_frames(pollutant, time_range, period, dtype):
+    """Return (blob, etag) for /api/heatmap-frames, cached per parameters and station data version"""
+    starts = frame_starts(time_range[0], time_range[1], period)
+    cities = station_grid()[0]
+    version = tuple(city_version(DATA_DIR, city) for city in cities)
+    key = (pollutant, time_range, period, dtype, version)
+    return FRAME_CACHE.get_or_render(key, lambda: build_heatmap_frames(pollutant, starts, period, dtype))
+
+@app.get("/api/heatmap-frames")
+async def get_heatmap_frames(
+    request: Request,
+    pollutant: str = Query(..., description="Pollutant name"),
+    start: str = Query(..., description="First date of the range (YYYY-MM-DD)"),
+    end: str = Query(..., description="Last date of the range (inclusive)"),
+    period: str = Query("day", description="One frame per day, month or year"),
+    dtype: str = Query("uint8", description="uint8 (quantized) or float16")
 ):
     """
-    Get pollution information for a specific location
+    Get a stack of interpolated heatmap grids, one per period in the range, as
+    a binary blob (see heatmap_frames.py for the layout) for animating the map.
+    Supports If-None-Match: an unchanged stack is answered with 304 Not Modified.
     """
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail=f"Unknown period '{period}'. Use one of: {', '.join(PERIODS)}")
+    if dtype not in FRAME_DTYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown dtype '{dtype}'. Use one of: {', '.join(FRAME_DTYPES)}")
+    # The pollutant ends up in rollup file paths, so only accept known values
+    if pollutant not in POLLUTANT_MAP:
+        raise HTTPException(status_code=404, detail=f"Pollutant '{pollutant}' not found")
     try:
-        # If city and pollutant are provided, get data for that combination
-        if city and pollutant:
-            city_dir = os.path.join(DATA_DIR, city)
-            
-            if not os.path.exists(city_dir):
-                return {"error": f"City '{city}' not found"}
-            
-            # Get all CSV files for the city
-            csv_files = glob.glob(os.path.join(city_dir, "*.csv"))
-            if not csv_files:
-                return {"error": f"No data files found for city '{city}'"}
-            
-            # Process data to find nearby measurements
-            nearby_data = []
-            
-            for csv_file in csv_files:
-                try:
-                    # Extract year from filename
-                    year = os.path.basename(csv_file).split('.')[0]
-                    
-                    # Read the CSV file
-                    df = pd.read_csv(csv_file)
-                    
-                    # Find the pollutant column
-                    pollutant_col = find_pollutant_column(df, pollutant)
-                    if not pollutant_col:
-                        continue
-                    
-                    # Check if location data exists
-                    has_location = 'Latitude' in df.columns and 'Longitude' in df.columns
-                    
-                    # If we have location data, find measurements near the requested coordinates
-                    if has_location:
-                        for _, row in df.iterrows():
-                            row_lat = row['Latitude']
-                            row_lon = row['Longitude']
-                            
-                            # Calculate distance (simple Euclidean, approximate)
-                            dist = ((row_lat - lat)**2 + (row_lon - lon)**2)**0.5
-                            
-                            if dist <= radius and pd.notna(row[pollutant_col]):
-                                nearby_data.append({
-                                    "year": year,
-                                    "distance_km": dist * 111,  # Rough conversion to km
-                                    "value": float(row[pollutant_col]),
-                                    "latitude": row_lat,
-                                    "longitude": row_lon,
-                                    "date": row.get('Date', f"{year}-01-01")
-                                })
-                
-                except Exception as e:
-                    print(f"Error processing file {csv_file}: {str(e)}")
-            
-            # Sort by distance
-            nearby_data.sort(key=lambda x: x["distance_km"])
-            
-            return {
-                "location": {"latitude": lat, "longitude": lon, "city": city},
-                "pollutant": pollutant,
-                "nearby_measurements": nearby_data[:10],  # Return closest 10 measurements
-                "average_value": sum(d["value"] for d in nearby_data) / len(nearby_data) if nearby_data else None
+        time_range = parse_time_range(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time range: {str(e)}")
+    frame_count = len(frame_starts(time_range[0], time_range[1], period))
+    if frame_count > HEATMAP_MAX_FRAMES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"The range spans {frame_count} frames; at most {HEATMAP_MAX_FRAMES} are allowed"
+        )
+    
+    blob, etag = await run_blocking(render_heatmap_frames, pollutant, time_range, period, dtype)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(blob, media_type="application/octet-stream", headers=headers)
+
+def find_location_info(lat, lon, city, pollutant, radius, k):
+    """Look up stations and measurements near a location for /api/location-info (blocking)"""
+    try:
+        if city and not os.path.exists(os.path.join(DATA_DIR, city)):
+            return {"error": f"City '{city}' not found"}
+        
+        # Nearest stations across all cities (great-circle distance)
+        cities, index = station_index()
+        positions, distances = index.nearest(lat, lon, k)
+        nearest_stations = [
+            {
+                "city": cities[i],
+                "latitude": CITY_COORDS[cities[i]][0],
+                "longitude": CITY_COORDS[cities[i]][1],
+                "distance_km": float(distance)
             }
+            for i, distance in zip(positions.tolist(), distances.tolist())
+        ]
         
-        # Otherwise, return info about the coordinates
-        else:
+        if not pollutant:
             return {
                 "location": {"latitude": lat, "longitude": lon},
-                "message": "Provide city and pollutant parameters to get pollution data for this location"
+                "nearest_stations": nearest_stations,
+                "message": "Provide a pollutant parameter to get pollution data for this location"
             }
+        # Sample indexes are kept per pollutant, so only accept known names
+        if pollutant not in POLLUTANT_MAP:
+            return {"error": f"Pollutant '{pollutant}' not found"}
+        
+        for station in nearest_stations:
+            station["average_value"] = station_average(station["city"], pollutant)
+        
+        # Measurements within the radius, from the given city or from every city
+        radius_km = radius * 111  # The radius is given in degrees
+        searched = [city] if city else [name for name in CATALOG.cities()]
+        matches = []
+        values = []
+        for name in searched:
+            samples, sample_idx = sample_index(name, pollutant)
+            # Every match counts towards the average, but only the closest 10 are sorted
+            in_radius, in_radius_distances = sample_idx.query_radius(lat, lon, radius_km)
+            values.append(samples["value"][in_radius])
+            rows, row_distances = closest(in_radius, in_radius_distances, 10)
+            matches.append([
+                {
+                    "year": samples["year"][i],
+                    "distance_km": float(distance),
+                    "value": float(samples["value"][i]),
+                    "latitude": float(samples["latitude"][i]),
+                    "longitude": float(samples["longitude"][i]),
+                    "date": samples["date"][i],
+                    "city": name
+                }
+                for i, distance in zip(rows.tolist(), row_distances.tolist())
+            ])
+        
+        # Each city's matches are already ordered, so merging them keeps the order
+        nearby_data = list(itertools.islice(heapq.merge(*matches, key=lambda x: x["distance_km"]), 10))
+        values = np.concatenate(values) if values else np.empty(0)
+        
+        location = {"latitude": lat, "longitude": lon}
+        if city:
+            location["city"] = city
+        return {
+            "location": location,
+            "pollutant": pollutant,
+            "nearest_stations": nearest_stations,
+            "nearby_measurements": nearby_data,  # Closest 10 measurements
+            "average_value": float(values.mean()) if len(values) else None
+        }
     
     except Exception as e:
         return {"error": f"Error retrieving location info: {str(e)}"}
 
+@app.get("/api/location-info")
+async def get_location_info(
+    lat: float = Query(..., description="Latitude of the location"),
+    lon: float = Query(..., description="Longitude of the location"),
+    city: str = Query(None, description="City name to filter data"),
+    pollutant: str = Query(None, description="Pollutant name to filter data"),
+    radius: float = Query(0.002, ge=0, description="Search radius in degrees"),
+    k: int = Query(3, ge=1, le=50, description="Number of nearest stations to return")
+):
+    """
+    Get the nearest stations and the measurements within `radius` of a location.
+    With a pollutant, measurements are searched in `city` or, without one, in every city.
+    """
+    return await run_blocking(find_location_info, lat, lon, city, pollutant, radius, k)
+
 @app.get("/api/leaflet-marker", response_class=HTMLResponse)
 async def add_leaflet_marker(
     lat: float = Query(..., description="Latitude of the location"),
@@ -1216,7 +1972,7 @@ async def calculate_emissions(data: EmissionInput):
 async def generate_report(data: EmissionInput):
     try:
         result = await calculate_emissions(data)
-        pdf_path = generate_pdf_report_calc(result, data)
+        pdf_path = await run_blocking(generate_pdf_report_calc, result, data)
         
         return FileResponse(
             path=pdf_path,
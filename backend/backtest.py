@@ -0,0 +1,114 @@
+"""
+Accuracy of the FutureData forecasts against the observed Data series.
+
+Forecast values are matched to the observed daily means (from the rollups)
+on the same day in one vectorized pass (a binary search of every forecast
+day in the observed days). Errors are summarized per horizon bucket, the
+horizon being the number of days between the start of a model's forecast
+run and the forecast day. Each scorecard reports MAE, RMSE, MAPE, bias
+(mean forecast minus observed) and the number of matched days.
+"""
+import numpy as np
+
+# Prefix of the forecast columns, e.g. Predicted_PM2.5 forecasts PM2.5
+FORECAST_PREFIX = "Predicted_"
+
+# Horizon buckets in days (inclusive; None means no upper bound)
+HORIZON_BUCKETS = ((1, 7), (8, 30), (31, 90), (91, 365), (366, None))
+
+METRICS = ("mae", "rmse", "mape", "bias")
+
+# Observed values closer to zero than this are left out of MAPE
+MAPE_MIN_OBSERVED = 1e-6
+
+
+def horizon_label(bucket):
+    low, high = bucket
+    return f"{low}+d" if high is None else f"{low}-{high}d"
+
+
+def forecast_pollutant(column, pollutants):
+    """Return the standard pollutant a forecast column predicts, or None"""
+    if not column.startswith(FORECAST_PREFIX):
+        return None
+    name = column[len(FORECAST_PREFIX):]
+    return name if name in pollutants else None
+
+
+def to_days(timestamps):
+    return np.asarray(timestamps).astype("datetime64[D]")
+
+
+def match_observed(forecast_days, observed_days, observed_values):
+    """Return the observed value on each forecast day, NaN where there is none"""
+    matched = np.full(len(forecast_days), np.nan)
+    if len(observed_days) == 0 or len(forecast_days) == 0:
+        return matched
+    positions = np.minimum(np.searchsorted(observed_days, forecast_days), len(observed_days) - 1)
+    found = observed_days[positions] == forecast_days
+    matched[found] = observed_values[positions[found]]
+    return matched
+
+
+def summarize_errors(forecast, observed):
+    """Return {"n", "mae", "rmse", "mape", "bias"} over the pairs where both values exist"""
+    valid = ~np.isnan(forecast) & ~np.isnan(observed)
+    n = int(valid.sum())
+    if n == 0:
+        return dict({"n": 0}, **{metric: None for metric in METRICS})
+    error = forecast[valid] - observed[valid]
+    nonzero = np.abs(observed[valid]) > MAPE_MIN_OBSERVED
+    return {
+        "n": n,
+        "mae": float(np.abs(error).mean()),
+        "rmse": float(np.sqrt((error ** 2).mean())),
+        "mape": float((np.abs(error[nonzero]) / np.abs(observed[valid][nonzero])).mean() * 100) if nonzero.any() else None,
+        "bias": float(error.mean()),
+    }
+
+
+def score_forecast(forecast_timestamps, forecast_values, observed_timestamps, observed_values, origin):
+    """
+    Score one forecast series against the observed daily series. `origin` is
+    the day before the forecast run's first day, so that day has horizon 1.
+    Returns [{"horizon", "n", "mae", "rmse", "mape", "bias"}], one per bucket.
+    """
+    forecast_days = to_days(forecast_timestamps)
+    observed = match_observed(forecast_days, to_days(observed_timestamps), np.asarray(observed_values, dtype=np.float64))
+    horizons = (forecast_days - to_days(origin)).astype(np.int64)
+    scores = []
+    for bucket in HORIZON_BUCKETS:
+        low, high = bucket
+        in_bucket = (horizons >= low) & (horizons <= high if high is not None else True)
+        scores.append(dict(
+            {"horizon": horizon_label(bucket)},
+            **summarize_errors(forecast_values[in_bucket], observed[in_bucket])
+        ))
+    return scores
+
+
+def coverage(timestamps):
+    """Return {"start", "end"} dates of a series (None when empty)"""
+    if len(timestamps) == 0:
+        return {"start": None, "end": None}
+    days = to_days(timestamps)
+    return {"start": str(days.min()), "end": str(days.max())}
+
+
+def best_models(scorecards, metric="rmse"):
+    """
+    Return {pollutant: {horizon: model}} with the lowest metric among the
+    scored models (for bias, the smallest absolute bias)
+    """
+    best = {}
+    for card in scorecards:
+        if card[metric] is None:
+            continue
+        score = abs(card[metric]) if metric == "bias" else card[metric]
+        current = best.setdefault(card["pollutant"], {}).get(card["horizon"])
+        if current is None or score < current[1]:
+            best[card["pollutant"]][card["horizon"]] = (card["model"], score)
+    return {
+        pollutant: {horizon: model for horizon, (model, _) in horizons.items()}
+        for pollutant, horizons in best.items()
+    }
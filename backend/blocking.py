@@ -0,0 +1,43 @@
+"""
+Bounded executor for the blocking parts of request handling.
+
+The endpoints are `async def`, so pandas reads, folium/HTML rendering and
+reportlab PDF builds would otherwise run on the event loop and stall every
+other request, including quick metadata calls like /api/cities. Heavy work
+is awaited through `run_blocking`, which runs it on a fixed-size thread pool
+so a burst of map or report requests queues up instead of starving the loop.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of heavy requests processed at once
+BLOCKING_WORKERS = max(1, int(os.environ.get("BLOCKING_WORKERS", "4")))
+
+_executor = None
+
+
+def get_executor():
+    """Return the shared executor, creating it on first use"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking")
+    return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run func(*args, **kwargs) on the blocking executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def iterate_blocking(iterator):
+    """Yield the items of a blocking iterator, producing each one on the blocking executor"""
+    iterator = iter(iterator)
+    done = object()
+    while True:
+        item = await run_blocking(next, iterator, done)
+        if item is done:
+            return
+        yield item
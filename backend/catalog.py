@@ -0,0 +1,222 @@
+"""
+In-memory catalog of the observed and forecast data files.
+
+The catalog lists cities, models and years and, for every file, its row
+count, time coverage and per-column null ratios. Pollutants are reported
+under their standard names. It is built once and then refreshed: at most
+every CATALOG_REFRESH_SECONDS the file tree is re-listed and stat'ed, and
+only new or changed files are read again. Files with an up-to-date columnar
+copy (see ingest.py) are described from its metadata without being read.
+"""
+import datetime
+import glob
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import columnar_store
+from dataset_cache import file_signature
+from schema_index import resolve_date_column, resolve_pollutant_columns
+from timestamps import parse_timestamps
+
+# Minimum delay between two scans of the data directories (in seconds)
+CATALOG_REFRESH_SECONDS = float(os.environ.get("CATALOG_REFRESH_SECONDS", "10"))
+
+
+def list_dirs(path):
+    """Return the sorted sub-directories of `path` (empty if it does not exist)"""
+    if not os.path.isdir(path):
+        return []
+    return sorted(name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name)))
+
+
+def file_year(path):
+    """Return the year in a <year>.csv or <MODEL>_Predicted_<year>.csv file name, or None"""
+    match = re.search(r"(\d{4})\.csv$", os.path.basename(path))
+    return match.group(1) if match else None
+
+
+def _iso(value):
+    """Format a timestamp (string or datetime64) as YYYY-MM-DDTHH:MM:SS, or None"""
+    return None if value is None else str(np.datetime64(value, "s"))
+
+
+def describe_file(path):
+    """Return {"rows", "start", "end", "columns": {name: {"non_null", "null_ratio"}}} for a data file"""
+    meta = columnar_store.read_meta(path)
+    if columnar_store.is_fresh(path, meta):
+        rows = meta["rows"]
+        start, end = _iso(meta["time_min"]), _iso(meta["time_max"])
+        counts = {entry["name"]: entry["non_null"] for entry in meta["columns"]}
+        date_column = meta["date_column"]
+    else:
+        df = pd.read_csv(path)
+        rows = len(df)
+        date_column = resolve_date_column(list(df.columns))
+        start = end = None
+        if date_column:
+            parsed, _ = parse_timestamps(df[date_column])
+            valid = parsed.dropna()
+            if len(valid):
+                start, end = _iso(valid.min().to_datetime64()), _iso(valid.max().to_datetime64())
+        counts = {
+            name: int(np.isfinite(pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64)).sum())
+            for name in df.columns if name != date_column
+        }
+
+    return {
+        "rows": int(rows),
+        "date_column": date_column,
+        "start": start,
+        "end": end,
+        "columns": {
+            name: {
+                "non_null": count,
+                "null_ratio": round(1 - count / rows, 4) if rows else None,
+            }
+            for name, count in counts.items()
+        },
+    }
+
+
+def _coverage(files):
+    starts = [entry["start"] for entry in files.values() if entry["start"]]
+    ends = [entry["end"] for entry in files.values() if entry["end"]]
+    return {"start": min(starts) if starts else None, "end": max(ends) if ends else None}
+
+
+class Catalog:
+    """Catalog of Data/<city>/<year>.csv and FutureData/<model>/<city>/*.csv files"""
+
+    def __init__(self, data_dir, future_data_dir, pollutant_map, refresh_seconds=CATALOG_REFRESH_SECONDS):
+        self.data_dir = data_dir
+        self.future_data_dir = future_data_dir
+        self.pollutant_map = pollutant_map
+        self.refresh_seconds = refresh_seconds
+        self._files = {}  # path -> (signature, description)
+        self._document = None
+        self._body = None
+        self._scanned_at = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.version = 0
+
+    def get(self):
+        """Return the catalog document, refreshing it first if it is due"""
+        self._refresh_if_due()
+        return self._document
+
+    def body(self):
+        """Return the catalog document encoded as JSON bytes (encoded once per version)"""
+        self._refresh_if_due()
+        return self._body
+
+    def cities(self):
+        return list(self.get()["cities"])
+
+    def models(self):
+        return list(self.get()["models"])
+
+    def _refresh_if_due(self):
+        # Only the very first build makes the caller wait; later refreshes run in
+        # the background while the previous document keeps being served
+        if self._document is None:
+            self.refresh()
+        elif time.monotonic() - self._scanned_at >= self.refresh_seconds and not self._refreshing:
+            self._refreshing = True
+            threading.Thread(target=self.refresh, name="catalog-refresh", daemon=True).start()
+
+    def refresh(self):
+        """Re-scan the data directories and re-describe new or changed files"""
+        with self._lock:
+            try:
+                self._scan()
+            finally:
+                self._scanned_at = time.monotonic()
+                self._refreshing = False
+
+    def _scan(self):
+        data_files = glob.glob(os.path.join(self.data_dir, "*", "*.csv"))
+        future_files = glob.glob(os.path.join(self.future_data_dir, "*", "*", "*.csv"))
+        changed = False
+        seen = set()
+        for path in data_files + future_files:
+            seen.add(path)
+            try:
+                signature = file_signature(path)
+                entry = self._files.get(path)
+                if entry is not None and entry[0] == signature:
+                    continue
+                self._files[path] = (signature, describe_file(path))
+                changed = True
+            except Exception as e:
+                print(f"Error cataloging {path}: {str(e)}")
+        for path in list(self._files):
+            if path not in seen:
+                del self._files[path]
+                changed = True
+
+        cities = list_dirs(self.data_dir)
+        models = list_dirs(self.future_data_dir)
+        if (changed or self._document is None
+                or list(self._document["cities"]) != cities or list(self._document["models"]) != models):
+            self._document = self._build(cities, models)
+            self._body = json.dumps(self._document, ensure_ascii=False).encode("utf-8")
+            self.version += 1
+
+    def _build(self, cities, models):
+        document = {
+            "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "cities": {},
+            "models": {},
+        }
+        for city in cities:
+            files = {}
+            for path in sorted(glob.glob(os.path.join(self.data_dir, city, "*.csv"))):
+                if path not in self._files:
+                    continue
+                description = self._files[path][1]
+                pollutants = resolve_pollutant_columns(list(description["columns"]), self.pollutant_map)
+                files[file_year(path) or os.path.basename(path)] = {
+                    "rows": description["rows"],
+                    "start": description["start"],
+                    "end": description["end"],
+                    "pollutants": {
+                        pollutant: dict(description["columns"][column], column=column)
+                        for pollutant, column in pollutants.items()
+                    },
+                }
+            document["cities"][city] = {
+                "years": list(files),
+                "pollutants": sorted({pollutant for entry in files.values() for pollutant in entry["pollutants"]}),
+                "coverage": _coverage(files),
+                "files": files,
+            }
+
+        for model in models:
+            model_cities = {}
+            for city in list_dirs(os.path.join(self.future_data_dir, model)):
+                files = {}
+                for path in sorted(glob.glob(os.path.join(self.future_data_dir, model, city, "*.csv"))):
+                    if path not in self._files:
+                        continue
+                    description = self._files[path][1]
+                    files[file_year(path) or os.path.basename(path)] = {
+                        "rows": description["rows"],
+                        "start": description["start"],
+                        "end": description["end"],
+                        "columns": description["columns"],
+                    }
+                model_cities[city] = {
+                    "years": list(files),
+                    "emission_types": sorted({column for entry in files.values() for column in entry["columns"]}),
+                    "coverage": _coverage(files),
+                    "files": files,
+                }
+            document["models"][model] = {"cities": model_cities}
+        return document
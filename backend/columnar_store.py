@@ -0,0 +1,196 @@
+"""
+Typed columnar copy of the Data/ tree.
+
+Each `Data/<city>/<year>.csv` is stored as a directory of NumPy arrays under
+STORE_DIR: one datetime64 index (`timestamp.npy`), one array per measurement
+column and a `meta.json` describing them. Arrays are written with np.save so
+they can be memory-mapped. The metadata records the source file's mtime and
+size, so a copy is only used (and only rebuilt) when it matches the CSV.
+
+Measurement columns are stored as float32 whenever that round-trips the CSV
+values exactly at their recorded precision, and as float64 otherwise.
+"""
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from data_config import ROOT_DIR
+from dataset_cache import file_signature
+from timestamps import parse_timestamps
+
+STORE_DIR = os.environ.get("COLUMNAR_STORE_DIR", os.path.join(ROOT_DIR, "Store"))
+
+STORE_VERSION = 1
+META_FILE = "meta.json"
+INDEX_FILE = "timestamp.npy"
+DATE_COLUMN = "Timestamp"
+
+
+def store_dir_for(csv_path):
+    """Return the store directory that holds the columnar copy of a CSV file"""
+    relative = os.path.relpath(os.path.abspath(csv_path), ROOT_DIR)
+    return os.path.join(STORE_DIR, os.path.splitext(relative)[0])
+
+
+def read_meta(csv_path):
+    """Return the stored metadata for a CSV file, or None if it has no columnar copy"""
+    meta_path = os.path.join(store_dir_for(csv_path), META_FILE)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(csv_path, meta=None):
+    """Check whether the columnar copy exists and matches the current CSV file"""
+    meta = meta if meta is not None else read_meta(csv_path)
+    if not meta or meta.get("version") != STORE_VERSION:
+        return False
+    try:
+        return list(file_signature(csv_path)) == meta.get("source_signature")
+    except OSError:
+        return False
+
+
+def _column_precision(values):
+    """Return the smallest number of decimals (up to 6) that represents every value exactly"""
+    finite = values[np.isfinite(values)]
+    for decimals in range(7):
+        if np.array_equal(np.round(finite, decimals), finite):
+            return decimals
+    return None
+
+
+def _encode_column(values):
+    """Pick the narrowest float dtype that reproduces the parsed CSV values"""
+    decimals = _column_precision(values)
+    if decimals is not None:
+        narrow = values.astype(np.float32)
+        restored = np.round(narrow.astype(np.float64), decimals)
+        if np.array_equal(restored, values, equal_nan=True):
+            return narrow, decimals
+    return values, None
+
+
+def write_store(csv_path):
+    """Convert one CSV file into its columnar copy and return the new metadata"""
+    signature = file_signature(csv_path)
+    df = pd.read_csv(csv_path)
+    if DATE_COLUMN not in df.columns:
+        raise ValueError(f"{csv_path} has no '{DATE_COLUMN}' column")
+
+    def write_arrays(target_dir):
+        timestamps, date_format = parse_timestamps(df[DATE_COLUMN])
+        index = timestamps.to_numpy(dtype="datetime64[ns]")
+        _save_array(os.path.join(target_dir, INDEX_FILE), index)
+
+        columns = []
+        for position, name in enumerate(df.columns):
+            if name == DATE_COLUMN:
+                continue
+            values = pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64)
+            encoded, decimals = _encode_column(values)
+            file_name = f"c{position:02d}.npy"
+            _save_array(os.path.join(target_dir, file_name), encoded)
+            columns.append({
+                "name": name,
+                "file": file_name,
+                "dtype": str(encoded.dtype),
+                "decimals": decimals,
+                "non_null": int(np.isfinite(values).sum()),
+            })
+
+        valid = index[~np.isnat(index)]
+        return {
+            "version": STORE_VERSION,
+            "source": os.path.relpath(os.path.abspath(csv_path), ROOT_DIR),
+            "source_signature": list(signature),
+            "rows": int(len(df)),
+            "date_column": DATE_COLUMN,
+            "date_format": date_format,
+            "time_min": str(valid.min()) if len(valid) else None,
+            "time_max": str(valid.max()) if len(valid) else None,
+            "columns": columns,
+        }
+
+    return write_with_meta(store_dir_for(csv_path), META_FILE, write_arrays)
+
+
+def write_with_meta(target_dir, meta_file, write_arrays):
+    """
+    Rebuild a store directory: `write_arrays(target_dir)` saves the arrays and
+    returns the metadata, which is written last. Returns the metadata.
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    meta_path = os.path.join(target_dir, meta_file)
+    # Remove the old metadata first so readers never pair it with new arrays
+    try:
+        os.remove(meta_path)
+    except FileNotFoundError:
+        pass
+    meta = write_arrays(target_dir)
+    replace_file(meta_path, lambda f: f.write(json.dumps(meta, ensure_ascii=False, indent=1).encode("utf-8")))
+    return meta
+
+
+def replace_file(path, write):
+    """Write a file through a unique temp file in the same directory, then swap it in"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.chmod(tmp_path, 0o644)  # mkstemp creates files readable by the owner only
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _save_array(path, values):
+    replace_file(path, lambda f: np.save(f, values, allow_pickle=False))
+
+
+def load_column(csv_path, column, meta=None):
+    """Load one measurement column as float64 values identical to the CSV parse"""
+    meta = meta if meta is not None else read_meta(csv_path)
+    for entry in meta["columns"]:
+        if entry["name"] == column:
+            values = np.load(os.path.join(store_dir_for(csv_path), entry["file"]), mmap_mode="r")
+            widened = values.astype(np.float64)
+            if entry["decimals"] is not None and values.dtype == np.float32:
+                widened = np.round(widened, entry["decimals"])
+            return widened
+    raise KeyError(column)
+
+
+def load_index(csv_path):
+    """Load the datetime64 index of a stored file (memory-mapped)"""
+    return np.load(os.path.join(store_dir_for(csv_path), INDEX_FILE), mmap_mode="r")
+
+
+def load_frame(csv_path, columns=None):
+    """
+    Build a DataFrame equivalent to pd.read_csv(csv_path) from the columnar copy.
+
+    The Timestamp column comes back as datetime64; the original date layout is
+    kept in `df.attrs["date_format"]`. Pass `columns` to load only a subset.
+    """
+    meta = read_meta(csv_path)
+    if meta is None:
+        raise FileNotFoundError(f"No columnar copy for {csv_path}")
+
+    date_column = meta["date_column"]
+    data = {}
+    if columns is None or date_column in columns:
+        data[date_column] = np.asarray(load_index(csv_path))
+    for entry in meta["columns"]:
+        if columns is None or entry["name"] in columns:
+            data[entry["name"]] = load_column(csv_path, entry["name"], meta)
+
+    df = pd.DataFrame(data)
+    df.attrs["date_format"] = meta["date_format"]
+    return df
@@ -0,0 +1,45 @@
+"""
+Locations and naming conventions of the pollution datasets.
+
+Shared by the API (app.py) and the offline tools such as ingest.py so they
+resolve files and pollutant columns the same way.
+"""
+import os
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Base directory for historical data files (Data/<city>/<year>.csv)
+DATA_DIR = os.path.join(ROOT_DIR, "Data")
+
+# Base directory for FutureData folder (FutureData/<model>/<city>/<model>_Predicted_<year>.csv)
+FUTURE_DATA_DIR = os.path.join(ROOT_DIR, "FutureData")
+
+# List of prediction model folders inside the FutureData directory
+MODEL_FOLDERS = ["LSTM", "RFR", "LGBM"]
+
+# Map of standardized pollutant names to possible column name variations
+POLLUTANT_MAP = {
+    'PM2.5': ['PM2.5', 'PM2.5 (µg/m³)'],
+    'PM10': ['PM10', 'PM10 (µg/m³)'],
+    'NO2': ['NO2', 'NO2 (µg/m³)'],
+    'SO2': ['SO2', 'SO2 (µg/m³)'],
+    'CO': ['CO', 'CO (mg/m³)'],
+    'Ozone': ['Ozone', 'Ozone (µg/m³)'],
+    'NO': ['NO', 'NO (µg/m³)'],
+    'NOx': ['NOx', 'NOx (ppb)'],
+    'NH3': ['NH3', 'NH3 (µg/m³)'],
+    'Benzene': ['Benzene', 'Benzene (µg/m³)'],
+    'AT': ['AT',"AT (Â°C)"],
+}
+
+# Standard pollutants to display
+STANDARD_POLLUTANTS = ['PM2.5', 'PM10', 'NO2', 'SO2', 'CO', 'Ozone','AT']
+# Default city coordinates for generating synthetic location data
+CITY_COORDS = {
+    'Byculla': (18.9794, 72.8368),
+    'Colaba': (18.9100, 72.8050),
+    'CSMT Airport': (18.9400, 72.8350),
+    'Mazgaon': (18.9600, 72.8450),
+    'Sion': (19.0390, 72.8619),
+    'Worli': (18.9925, 72.8175)
+}
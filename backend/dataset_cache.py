@@ -0,0 +1,119 @@
+"""
+Process-wide cache for parsed CSV datasets.
+
+Each file is parsed once and reused until its modification time or size
+changes on disk. Entries are evicted least-recently-used first once the
+configured memory budget is exceeded.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Memory budget for cached DataFrames (in megabytes)
+DEFAULT_MAX_MB = float(os.environ.get("DATASET_CACHE_MAX_MB", "512"))
+
+
+def file_signature(path):
+    """Return the (mtime, size) pair used to detect changes to a file"""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class DatasetCache:
+    """LRU cache of DataFrames keyed by file path, validated by mtime and size"""
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = int(max_bytes if max_bytes is not None else DEFAULT_MAX_MB * 1024 * 1024)
+        self._entries = OrderedDict()  # key -> (signature, dataframe, size in bytes)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def load(self, path, loader, variant=None):
+        """
+        Return the DataFrame for `path`, calling `loader(path)` only when the
+        file is not cached or has changed since it was cached.
+
+        `variant` distinguishes different parses of the same file (for example
+        different column selections). The returned frame is a shallow copy, so
+        callers may add columns without affecting the cached entry.
+        """
+        path = os.path.abspath(path)
+        key = (path, variant)
+        signature = file_signature(path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == signature:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1].copy(deep=False)
+                # The file changed on disk, drop the stale entry
+                self._remove(key)
+                self.invalidations += 1
+            self.misses += 1
+
+        # Parse outside the lock so other files can be served meanwhile
+        df = loader(path)
+        size = int(df.memory_usage(index=True, deep=True).sum())
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size <= self.max_bytes:
+                self._entries[key] = (signature, df, size)
+                self.current_bytes += size
+                self._evict()
+
+        return df.copy(deep=False)
+
+    def read_csv(self, path, **kwargs):
+        """Cached equivalent of pd.read_csv(path, **kwargs)"""
+        variant = tuple(sorted(
+            (name, tuple(value) if isinstance(value, (list, set)) else value)
+            for name, value in kwargs.items()
+        ))
+        return self.load(path, lambda p: pd.read_csv(p, **kwargs), variant or None)
+
+    def invalidate(self, path=None):
+        """Drop every cached parse of `path`, or the whole cache if no path is given"""
+        with self._lock:
+            if path is None:
+                keys = list(self._entries)
+            else:
+                path = os.path.abspath(path)
+                keys = [key for key in self._entries if key[0] == path]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+
+    def stats(self):
+        """Return counters that help size the memory budget"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
@@ -0,0 +1,130 @@
+"""
+Pre-render heatmap pages and series into static files.
+
+The frontend is published as a static site, so the read-only responses can
+be generated ahead of time and served from there instead of the API. Run
+from the backend directory:
+
+    python export_static.py                        # write to ../frontend/static
+    python export_static.py out/ --resolution month
+    python export_static.py --cities Colaba Sion --pollutants PM2.5 NO2
+
+Layout of the target directory:
+
+    cities.json, pollutants.json, models.json, catalog.json
+    maps/<city>/<pollutant>.html        same page as /api/folium-map
+    series/<city>/<pollutant>.json      same body as /api/pollution-data?shape=columns&resolution=...
+    index.json                          what was exported, with the resolution used
+
+Files whose content did not change are left untouched, so repeated exports
+only rewrite what the new data affects.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+
+import app as api
+from columnar_store import replace_file
+from data_config import DATA_DIR, ROOT_DIR, STANDARD_POLLUTANTS
+from resample import RAW_RESOLUTION, RESOLUTIONS, AGGREGATE_KEYS
+from response_formats import columns_payload
+
+DEFAULT_TARGET = os.path.join(ROOT_DIR, "frontend", "static")
+
+
+def write_if_changed(path, content):
+    """Write text to `path` unless it already holds exactly that; return True if written"""
+    data = content.encode("utf-8")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    replace_file(path, lambda f: f.write(data))
+    return True
+
+
+def export_series(city, pollutant, resolution, max_points=None):
+    """Return the shape=columns document for a city and pollutant, or None without data"""
+    csv_files = glob.glob(os.path.join(DATA_DIR, city, "*.csv"))
+    if resolution != RAW_RESOLUTION or max_points:
+        parts = list(api.iter_resampled_columns(city, pollutant, csv_files, None, resolution, max_points))
+        extra_keys = AGGREGATE_KEYS
+    else:
+        parts = list(api.iter_pollution_columns(city, pollutant, csv_files))
+        extra_keys = ()
+    if not parts:
+        return None
+    meta = {"city": city, "pollutant": pollutant, "resolution": resolution}
+    return columns_payload(parts, meta, extra_keys=extra_keys)
+
+
+def export(target, cities=None, pollutants=None, resolution="day", max_points=None, maps=True, series=True):
+    """Render every city x pollutant into `target` and return (written, unchanged) counts"""
+    written = unchanged = 0
+
+    def save(relative_path, content):
+        nonlocal written, unchanged
+        if write_if_changed(os.path.join(target, relative_path), content):
+            written += 1
+        else:
+            unchanged += 1
+
+    catalog = api.CATALOG.get()
+    cities = cities or list(catalog["cities"])
+    pollutants = pollutants or list(STANDARD_POLLUTANTS)
+
+    save("cities.json", json.dumps({"cities": list(catalog["cities"])}))
+    save("pollutants.json", json.dumps({"pollutants": STANDARD_POLLUTANTS}))
+    save("models.json", json.dumps({"models": list(catalog["models"])}))
+    save("catalog.json", json.dumps({key: value for key, value in catalog.items() if key != "generated_at"}, ensure_ascii=False))
+
+    index = {"resolution": resolution, "max_points": max_points, "maps": {}, "series": {}}
+    for city in cities:
+        started = time.perf_counter()
+        for pollutant in pollutants:
+            # Only pollutants the catalog knows for this city have data to render
+            if pollutant not in catalog["cities"].get(city, {}).get("pollutants", []):
+                continue
+            if maps:
+                html = api.build_folium_html(city, pollutant, True)
+                save(os.path.join("maps", city, f"{pollutant}.html"), html)
+                index["maps"].setdefault(city, []).append(pollutant)
+            if series:
+                document = export_series(city, pollutant, resolution, max_points)
+                if document is not None:
+                    save(os.path.join("series", city, f"{pollutant}.json"), json.dumps(document, ensure_ascii=False))
+                    index["series"].setdefault(city, []).append(pollutant)
+        print(f"Exported {city} in {time.perf_counter() - started:.2f}s")
+
+    save("index.json", json.dumps(index, ensure_ascii=False))
+    return written, unchanged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render heatmaps and series into static files")
+    parser.add_argument("target", nargs="?", default=DEFAULT_TARGET, help="Output directory (default: frontend/static)")
+    parser.add_argument("--cities", nargs="*", help="Only export these cities (default: all)")
+    parser.add_argument("--pollutants", nargs="*", help="Only export these pollutants (default: all standard pollutants)")
+    parser.add_argument("--resolution", default="day", choices=RESOLUTIONS, help="Resolution of the exported series")
+    parser.add_argument("--max-points", type=int, default=None, help="Downsample each series to at most this many points")
+    parser.add_argument("--no-maps", action="store_true", help="Skip the heatmap pages")
+    parser.add_argument("--no-series", action="store_true", help="Skip the series files")
+    args = parser.parse_args()
+
+    if args.max_points is not None and args.max_points < 3:
+        parser.error("--max-points must be at least 3")
+
+    written, unchanged = export(
+        args.target, args.cities, args.pollutants, args.resolution, args.max_points,
+        maps=not args.no_maps, series=not args.no_series
+    )
+    print(f"Target directory: {os.path.abspath(args.target)}")
+    print(f"Wrote {written} files, {unchanged} unchanged")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
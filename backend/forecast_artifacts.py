@@ -0,0 +1,186 @@
+"""
+Cleaned, binary copies of the forecast files under FutureData/.
+
+forecast_pipeline.py turns each `FutureData/<model>/<city>/*.csv` into an
+artifact under STORE_DIR/FutureData: the rows sorted by date, with rows
+whose date does not parse dropped and repeated dates averaged into one.
+The arrays are saved in one `forecast.npz` next to a `forecast.json` that
+records the source file's mtime and size and a continuity report (gaps in
+the dates, duplicates and invalid dates found). The prediction store reads
+an artifact instead of the CSV whenever it matches the current file.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from catalog import file_year
+from columnar_store import replace_file, store_dir_for, write_with_meta
+from dataset_cache import file_signature
+from schema_index import resolve_date_column
+from timestamps import parse_timestamps
+
+ARTIFACT_VERSION = 1
+ARTIFACT_FILE = "forecast.npz"
+ARTIFACT_META = "forecast.json"
+
+
+def read_artifact_meta(csv_path):
+    """Return the artifact metadata of a forecast file, or None if it has none"""
+    try:
+        with open(os.path.join(store_dir_for(csv_path), ARTIFACT_META), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def artifact_signature(csv_path):
+    """Return the (mtime, size) of the artifact metadata, or None; changes whenever an artifact is rebuilt"""
+    try:
+        return file_signature(os.path.join(store_dir_for(csv_path), ARTIFACT_META))
+    except OSError:
+        return None
+
+
+def artifact_is_fresh(csv_path, meta=None):
+    """Check whether the artifact exists and was built from the current CSV file"""
+    meta = meta if meta is not None else read_artifact_meta(csv_path)
+    if not meta or meta.get("version") != ARTIFACT_VERSION:
+        return False
+    try:
+        return list(file_signature(csv_path)) == meta.get("source_signature")
+    except OSError:
+        return False
+
+
+def average_duplicates(timestamps, values):
+    """
+    Collapse repeated timestamps into one row each, averaging every column over
+    the repeats (ignoring NaN). Returns (sorted unique timestamps, values).
+    """
+    unique, inverse = np.unique(timestamps, return_inverse=True)
+    if len(unique) == len(timestamps):
+        order = np.argsort(timestamps, kind="stable")
+        return timestamps[order], values[order]
+    averaged = np.empty((len(unique), values.shape[1]))
+    for column in range(values.shape[1]):
+        present = ~np.isnan(values[:, column])
+        sums = np.bincount(inverse[present], weights=values[present, column], minlength=len(unique))
+        counts = np.bincount(inverse[present], minlength=len(unique))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            averaged[:, column] = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+    return unique, averaged
+
+
+def find_gaps(timestamps, step=None):
+    """
+    Return (step, gaps): the regular spacing of sorted timestamps (the most
+    common difference unless given) and [{"after", "before", "missing"}] for
+    every place where consecutive timestamps are further apart than that
+    """
+    if len(timestamps) < 2:
+        return step, []
+    diffs = np.diff(timestamps)
+    if step is None:
+        steps, counts = np.unique(diffs, return_counts=True)
+        step = steps[np.argmax(counts)]
+    gaps = []
+    for position in np.flatnonzero(diffs > step):
+        gaps.append({
+            "after": str(timestamps[position].astype("datetime64[s]")),
+            "before": str(timestamps[position + 1].astype("datetime64[s]")),
+            "missing": int(diffs[position] // step) - 1,
+        })
+    return step, gaps
+
+
+def year_edges(timestamps, step, year):
+    """For daily data, the gaps between the start of `year` and the first row and between the last row and its end"""
+    if step != np.timedelta64(1, "D") or not len(timestamps):
+        return []
+    first = np.datetime64(f"{year}-01-01", "ns")
+    last = np.datetime64(f"{int(year)}-12-31", "ns")
+    edges = []
+    if timestamps[0] > first:
+        edges.append({"after": None, "before": str(timestamps[0].astype("datetime64[s]")),
+                      "missing": int((timestamps[0] - first) // step)})
+    if timestamps[-1] < last:
+        edges.append({"after": str(timestamps[-1].astype("datetime64[s]")), "before": None,
+                      "missing": int((last - timestamps[-1]) // step)})
+    return edges
+
+
+def clean_forecast(df, year=None):
+    """
+    Clean one forecast table. Returns (date column, date format, timestamps,
+    {column: values}, report) with the rows sorted and one row per date. With
+    the file's `year`, daily data is also checked to cover the whole year.
+    """
+    date_column = resolve_date_column(list(df.columns))
+    if not date_column:
+        raise ValueError("no date column")
+    parsed, date_format = parse_timestamps(df[date_column])
+    timestamps = parsed.to_numpy(dtype="datetime64[ns]")
+    names = [name for name in df.columns if name != date_column]
+    values = np.column_stack([
+        pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64) for name in names
+    ]) if names else np.empty((len(df), 0))
+
+    valid = ~np.isnat(timestamps)
+    invalid_dates = df[date_column][~valid].astype(str).tolist()
+    timestamps, values = average_duplicates(timestamps[valid], values[valid])
+    step, gaps = find_gaps(timestamps)
+    if year is not None:
+        edges = year_edges(timestamps, step, year)
+        gaps = [gap for gap in edges if gap["after"] is None] + gaps + [gap for gap in edges if gap["before"] is None]
+
+    report = {
+        "rows_in": int(len(df)),
+        "rows_out": int(len(timestamps)),
+        "invalid_dates": invalid_dates,
+        "duplicates": int(valid.sum()) - int(len(timestamps)),
+        "step_seconds": int(step / np.timedelta64(1, "s")) if step is not None else None,
+        "start": str(timestamps[0].astype("datetime64[s]")) if len(timestamps) else None,
+        "end": str(timestamps[-1].astype("datetime64[s]")) if len(timestamps) else None,
+        "gaps": gaps,
+        "missing": sum(gap["missing"] for gap in gaps),
+    }
+    columns = {name: values[:, position] for position, name in enumerate(names)}
+    return date_column, date_format, timestamps, columns, report
+
+
+def write_artifact(csv_path):
+    """Clean one forecast file, save its artifact and return the new metadata"""
+    signature = file_signature(csv_path)
+    df = pd.read_csv(csv_path)
+    date_column, date_format, timestamps, columns, report = clean_forecast(df, file_year(csv_path))
+
+    def write_arrays(target_dir):
+        arrays = {"timestamp": timestamps}
+        entries = []
+        for position, (name, values) in enumerate(columns.items()):
+            key = f"c{position:02d}"
+            arrays[key] = values
+            entries.append({"name": name, "key": key, "non_null": int(np.isfinite(values).sum())})
+        replace_file(os.path.join(target_dir, ARTIFACT_FILE), lambda f: np.savez(f, **arrays))
+        return {
+            "version": ARTIFACT_VERSION,
+            "source": os.path.basename(csv_path),
+            "source_signature": list(signature),
+            "date_column": date_column,
+            "date_format": date_format,
+            "columns": entries,
+            "report": report,
+        }
+
+    return write_with_meta(store_dir_for(csv_path), ARTIFACT_META, write_arrays)
+
+
+def load_artifact(csv_path, meta=None):
+    """Return (timestamps, {column: values}, date format) from a forecast file's artifact"""
+    meta = meta if meta is not None else read_artifact_meta(csv_path)
+    with np.load(os.path.join(store_dir_for(csv_path), ARTIFACT_FILE), allow_pickle=False) as arrays:
+        timestamps = arrays["timestamp"]
+        columns = {entry["name"]: arrays[entry["key"]] for entry in meta["columns"]}
+    return timestamps, columns, meta["date_format"]
@@ -0,0 +1,98 @@
+"""
+Clean the FutureData/ forecast files into the artifacts read by the API.
+
+For every FutureData/<model>/<city>/*.csv this drops rows whose date does
+not parse, averages repeated dates, sorts the rows and checks that the
+dates are continuous, then saves the result (see forecast_artifacts.py).
+Files are processed in parallel on a process pool, and files whose
+artifact is already up to date are skipped. Replaces the old one-off
+FutureData/RFR/Colaba/Avg.py, and never modifies the CSV files themselves.
+
+Run from the backend directory:
+
+    python forecast_pipeline.py               # process new or changed files
+    python forecast_pipeline.py --force       # process everything again
+    python forecast_pipeline.py LSTM RFR      # limit to some models
+    python forecast_pipeline.py --workers 2
+"""
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import columnar_store
+from data_config import FUTURE_DATA_DIR
+from forecast_artifacts import artifact_is_fresh, write_artifact
+
+
+def find_forecast_files(future_data_dir, models=None, cities=None):
+    """List every FutureData/<model>/<city>/*.csv file, optionally limited to some models and cities"""
+    csv_files = sorted(glob.glob(os.path.join(future_data_dir, "*", "*", "*.csv")))
+    if models:
+        csv_files = [path for path in csv_files if os.path.basename(os.path.dirname(os.path.dirname(path))) in models]
+    if cities:
+        csv_files = [path for path in csv_files if os.path.basename(os.path.dirname(path)) in cities]
+    return csv_files
+
+
+def process_file(csv_file):
+    """Build one artifact and return (csv_file, report, seconds); runs in a worker process"""
+    started = time.perf_counter()
+    meta = write_artifact(csv_file)
+    return csv_file, meta["report"], time.perf_counter() - started
+
+
+def describe_report(report):
+    """One-line summary of what cleaning a file found"""
+    notes = []
+    if report["invalid_dates"]:
+        notes.append(f"dropped {len(report['invalid_dates'])} invalid dates ({', '.join(report['invalid_dates'][:3])})")
+    if report["duplicates"]:
+        notes.append(f"averaged {report['duplicates']} duplicate rows")
+    if report["gaps"]:
+        notes.append(f"{report['missing']} missing steps in {len(report['gaps'])} gaps")
+    return "; ".join(notes) or "clean"
+
+
+def run_pipeline(future_data_dir=FUTURE_DATA_DIR, models=None, cities=None, force=False, workers=None):
+    """Process new or changed forecast files and return (built, skipped, failed) counts"""
+    csv_files = find_forecast_files(future_data_dir, models, cities)
+    pending = [path for path in csv_files if force or not artifact_is_fresh(path)]
+    skipped = len(csv_files) - len(pending)
+    built = failed = 0
+    if not pending:
+        return built, skipped, failed
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process_file, path): path for path in pending}
+        for future, path in futures.items():
+            name = os.path.relpath(path, future_data_dir)
+            try:
+                _, report, seconds = future.result()
+            except Exception as e:
+                print(f"Error processing {name}: {str(e)}")
+                failed += 1
+                continue
+            built += 1
+            print(f"Processed {name}: {report['rows_in']} -> {report['rows_out']} rows in {seconds:.2f}s, {describe_report(report)}")
+    return built, skipped, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean the FutureData/ forecast files into API artifacts")
+    parser.add_argument("models", nargs="*", help="Only process these models (default: all)")
+    parser.add_argument("--cities", nargs="*", help="Only process these cities (default: all)")
+    parser.add_argument("--future-data-dir", default=FUTURE_DATA_DIR, help="Directory containing <model>/<city>/*.csv files")
+    parser.add_argument("--force", action="store_true", help="Process files even if their artifact is up to date")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    built, skipped, failed = run_pipeline(args.future_data_dir, args.models, args.cities, args.force, args.workers)
+    print(f"Store directory: {columnar_store.STORE_DIR}")
+    print(f"Processed {built}, skipped {skipped} up-to-date, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
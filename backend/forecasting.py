@@ -0,0 +1,224 @@
+"""
+Lightweight daily forecasting models trained on the observed Data series.
+
+Each (city, pollutant) is modelled on its daily means (from the rollups).
+The features of a day only look back a year or more: seasonal harmonics of
+the day of year and week, a trend, the day-of-year climatology and the values
+365 and 730 days earlier (smoothed over a week). A whole year can therefore
+be predicted in one batch, and long horizons are forecast a year at a time,
+each year's predictions feeding the lags of the next.
+
+GBR (histogram gradient boosting, the default) and RF (random forest) are
+scikit-learn regressors, installed with `pip install -r requirements-train.txt`
+where models are trained (the API does not need it). RIDGE, a closed-form
+ridge regression in NumPy, works without it. Fitted models are pickled under
+STORE_DIR/models together with a key describing the data they were trained
+on, and are reused until that data changes.
+"""
+import json
+import os
+import pickle
+
+import numpy as np
+
+import columnar_store
+
+try:
+    from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+except ImportError:  # Optional, only needed for the GBR and RF models
+    HistGradientBoostingRegressor = RandomForestRegressor = None
+
+SKLEARN_AVAILABLE = HistGradientBoostingRegressor is not None
+
+MODEL_DIR = os.path.join(columnar_store.STORE_DIR, "models")
+
+# Bump when the features change so cached models are retrained
+FEATURE_VERSION = 1
+
+# Lags (in days) of the smoothed series used as features
+LAGS = (365, 730)
+
+# Days averaged around each lag
+LAG_WINDOW = 7
+
+# Days predicted per batch; must not exceed the shortest lag
+BLOCK_DAYS = min(LAGS)
+
+# Days of history required before a model is trained
+MIN_TRAINING_DAYS = 2 * max(LAGS) // 3
+
+
+class RidgeModel:
+    """Ridge regression on standardized features, fitted in closed form"""
+
+    def __init__(self, alpha=1.0):
+        self.alpha = alpha
+
+    def fit(self, features, target):
+        self.mean_ = features.mean(axis=0)
+        self.scale_ = features.std(axis=0)
+        self.scale_[self.scale_ == 0] = 1.0
+        x = (features - self.mean_) / self.scale_
+        self.intercept_ = target.mean()
+        gram = x.T @ x + self.alpha * np.eye(x.shape[1])
+        self.coef_ = np.linalg.solve(gram, x.T @ (target - self.intercept_))
+        return self
+
+    def predict(self, features):
+        return ((features - self.mean_) / self.scale_) @ self.coef_ + self.intercept_
+
+
+def _build_gbr():
+    return HistGradientBoostingRegressor(max_iter=200, learning_rate=0.05, random_state=0)
+
+
+def _build_rf():
+    return RandomForestRegressor(n_estimators=100, min_samples_leaf=3, n_jobs=1, random_state=0)
+
+
+# Model name -> (constructor, parameters recorded in the cache key)
+MODELS = {
+    "GBR": (_build_gbr, {"max_iter": 200, "learning_rate": 0.05}),
+    "RF": (_build_rf, {"n_estimators": 100, "min_samples_leaf": 3}),
+    "RIDGE": (RidgeModel, {"alpha": 1.0}),
+}
+
+# Models that need scikit-learn
+SKLEARN_MODELS = ("GBR", "RF")
+
+DEFAULT_MODEL = "GBR"
+
+
+def unavailable_models(model_names):
+    """Return the models in `model_names` that cannot be built here (scikit-learn missing)"""
+    if SKLEARN_AVAILABLE:
+        return []
+    return [name for name in model_names if name in SKLEARN_MODELS]
+
+
+def daily_series(timestamps, values):
+    """Spread daily means onto a continuous daily axis: (days, values with NaN gaps)"""
+    days = np.asarray(timestamps).astype("datetime64[D]")
+    if len(days) == 0:
+        return days, np.empty(0)
+    axis = np.arange(days.min(), days.max() + 1)
+    filled = np.full(len(axis), np.nan)
+    filled[(days - axis[0]).astype(np.int64)] = values
+    return axis, filled
+
+
+def climatology(days, values):
+    """Mean value per day of year (366 slots), NaN-free: empty slots take the overall mean"""
+    slots = day_of_year(days)
+    present = ~np.isnan(values)
+    sums = np.bincount(slots[present], weights=values[present], minlength=366)
+    counts = np.bincount(slots[present], minlength=366)
+    overall = values[present].mean() if present.any() else 0.0
+    # Smooth over a week on the circular calendar before filling
+    kernel = np.ones(LAG_WINDOW)
+    wrap = LAG_WINDOW // 2
+    sums = np.convolve(np.concatenate([sums[-wrap:], sums, sums[:wrap]]), kernel, "valid")
+    counts = np.convolve(np.concatenate([counts[-wrap:], counts, counts[:wrap]]), kernel, "valid")
+    return np.where(counts > 0, sums / np.maximum(counts, 1), overall)
+
+
+def day_of_year(days):
+    return (days - days.astype("datetime64[Y]")).astype(np.int64)
+
+
+def smoothed(values):
+    """Centered rolling mean over LAG_WINDOW days, ignoring NaN"""
+    present = ~np.isnan(values)
+    kernel = np.ones(LAG_WINDOW)
+    sums = np.convolve(np.where(present, values, 0.0), kernel, "same")
+    counts = np.convolve(present.astype(np.float64), kernel, "same")
+    return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def build_features(days, history, origin, clim, start_day):
+    """
+    Feature matrix for `days`. `history` holds the (observed or predicted)
+    values of the continuous daily axis starting at `origin`; lags reaching
+    before it or into gaps fall back to the climatology.
+    """
+    doy = day_of_year(days)
+    angle = 2 * np.pi * doy / 365.25
+    weekday = (days.astype(np.int64) + 3) % 7  # 0 is Monday
+    week_angle = 2 * np.pi * weekday / 7
+    columns = [
+        np.sin(angle), np.cos(angle),
+        np.sin(2 * angle), np.cos(2 * angle),
+        np.sin(3 * angle), np.cos(3 * angle),
+        np.sin(week_angle), np.cos(week_angle),
+        (days - start_day).astype(np.int64) / 365.25,
+        clim[doy],
+    ]
+    smooth = smoothed(history)
+    for lag in LAGS:
+        positions = (days - origin).astype(np.int64) - lag
+        inside = (positions >= 0) & (positions < len(smooth))
+        lagged = np.full(len(days), np.nan)
+        lagged[inside] = smooth[positions[inside]]
+        columns.append(np.where(np.isnan(lagged), clim[doy], lagged))
+    return np.column_stack(columns)
+
+
+def fit_model(model_name, days, values, clim):
+    """Fit a model on the days that have a value and return it"""
+    build, _ = MODELS[model_name]
+    features = build_features(days, values, days[0], clim, days[0])
+    present = ~np.isnan(values)
+    return build().fit(features[present], values[present])
+
+
+def forecast(model, days, values, clim, until, start_day):
+    """
+    Forecast every day after the history up to `until` (inclusive), a year
+    at a time. Returns (forecast days, predictions).
+    """
+    history = values.copy()
+    origin = days[0]
+    last = days[-1]
+    predicted_days = []
+    predictions = []
+    while last < until:
+        block = np.arange(last + 1, min(last + BLOCK_DAYS, until) + 1)
+        block_values = np.maximum(model.predict(build_features(block, history, origin, clim, start_day)), 0.0)
+        history = np.concatenate([history, block_values])
+        predicted_days.append(block)
+        predictions.append(block_values)
+        last = block[-1]
+    if not predicted_days:
+        return np.empty(0, dtype="datetime64[D]"), np.empty(0)
+    return np.concatenate(predicted_days), np.concatenate(predictions)
+
+
+def model_path(model_name, city, pollutant):
+    return os.path.join(MODEL_DIR, model_name, city, f"{pollutant}.pkl")
+
+
+def cache_key(model_name, data_version, cutoff):
+    """Describe what a fitted model depends on; a cached model is reused only if this matches"""
+    return json.dumps({
+        "model": model_name,
+        "params": MODELS[model_name][1],
+        "features": FEATURE_VERSION,
+        "data": data_version,
+        "cutoff": cutoff,
+    }, sort_keys=True)
+
+
+def load_cached_model(model_name, city, pollutant, key):
+    """Return the pickled model for this key, or None if missing or stale"""
+    try:
+        with open(model_path(model_name, city, pollutant), "rb") as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    return cached["model"] if cached.get("key") == key else None
+
+
+def save_model(model_name, city, pollutant, key, model):
+    path = model_path(model_name, city, pollutant)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    columnar_store.replace_file(path, lambda f: pickle.dump({"key": key, "model": model}, f))
@@ -0,0 +1,95 @@
+"""
+Stacks of interpolated heatmap frames encoded as one binary blob.
+
+A time slider over the map needs one grid per day (or month, or year). All
+frames are interpolated at once: the station means per period form a
+(stations x frames) matrix, and one product with the IDW weights (see
+interpolation.py) yields every frame. The stack is sent as
+
+    b"HMF1" | uint32 header length (little endian) | JSON header | frame data
+
+where the frame data is frames x rows x cols values in row-major order,
+south to north and west to east. With dtype uint8, 0 means no data and
+1-255 map linearly onto [header "offset", offset + 254 * header "scale"];
+with float16 the values are stored as is and NaN means no data.
+"""
+import json
+import os
+import struct
+
+import numpy as np
+
+FRAME_MAGIC = b"HMF1"
+
+FRAME_DTYPES = ("uint8", "float16")
+
+# Largest number of frames served in one blob
+HEATMAP_MAX_FRAMES = int(os.environ.get("HEATMAP_MAX_FRAMES", "400"))
+
+# numpy datetime unit of each frame period
+PERIOD_UNITS = {"day": "D", "month": "M", "year": "Y"}
+
+
+def frame_starts(start, end, period):
+    """
+    Return the start of every period overlapping the half-open [start, end)
+    range as datetime64[ns] values, matching the rollup table timestamps
+    """
+    unit = PERIOD_UNITS[period]
+    first = start.astype(f"datetime64[{unit}]")
+    last = (end - np.timedelta64(1, "ns")).astype(f"datetime64[{unit}]")
+    return np.arange(first, last + 1).astype("datetime64[ns]")
+
+
+def align_station_values(table, starts):
+    """Means of a rollup table at the given period starts, NaN where it has no data"""
+    timestamps = table["timestamp"]
+    values = np.full(len(starts), np.nan)
+    if len(timestamps) == 0:
+        return values
+    positions = np.minimum(np.searchsorted(timestamps, starts), len(timestamps) - 1)
+    found = (timestamps[positions] == starts) & (table["count"][positions] > 0)
+    values[found] = table["mean"][positions[found]]
+    return values
+
+
+def quantize(frames):
+    """Return (uint8 frames, offset, scale); 0 marks missing values"""
+    finite = np.isfinite(frames)
+    if not finite.any():
+        return np.zeros(frames.shape, dtype=np.uint8), 0.0, 1.0
+    low = float(frames[finite].min())
+    high = float(frames[finite].max())
+    scale = (high - low) / 254 if high > low else 1.0
+    levels = np.rint((np.where(finite, frames, low) - low) / scale) + 1
+    return np.where(finite, levels, 0).astype(np.uint8), low, scale
+
+
+def encode_frames(frames, header, dtype="uint8"):
+    """
+    Encode a (frames x rows x cols) float array and a header dict into a blob.
+    The dtype, shape and (for uint8) offset/scale are added to the header.
+    """
+    header = dict(header, dtype=dtype, shape=list(frames.shape))
+    if dtype == "uint8":
+        data, offset, scale = quantize(frames)
+        header.update(offset=offset, scale=scale)
+    else:
+        data = frames.astype("<f2")
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    return FRAME_MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes + data.tobytes()
+
+
+def decode_frames(blob):
+    """Return (header, frames) from a blob, with uint8 frames converted back to floats"""
+    if blob[:4] != FRAME_MAGIC:
+        raise ValueError("Not a heatmap frames blob")
+    (length,) = struct.unpack("<I", blob[4:8])
+    header = json.loads(blob[8:8 + length].decode("utf-8"))
+    dtype = "<f2" if header["dtype"] == "float16" else np.uint8
+    data = np.frombuffer(blob, dtype=dtype, offset=8 + length).reshape(header["shape"])
+    if header["dtype"] == "uint8":
+        frames = np.where(data > 0, header["offset"] + (data.astype(np.float64) - 1) * header["scale"], np.nan)
+    else:
+        frames = data.astype(np.float64)
+    return header, frames
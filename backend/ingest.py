@@ -0,0 +1,82 @@
+"""
+Convert the Data/ tree into the columnar store read by the API, then
+refresh the per-city rollups served by /api/summary.
+
+Run from the backend directory:
+
+    python ingest.py            # rebuild only files whose CSV changed
+    python ingest.py --force    # rebuild everything
+    python ingest.py Colaba     # limit to one or more cities
+"""
+import argparse
+import glob
+import os
+import time
+
+import columnar_store
+from data_config import DATA_DIR, POLLUTANT_MAP, STANDARD_POLLUTANTS
+from rollups import RollupStore, load_city_series
+from schema_index import SchemaIndex
+
+
+def find_source_files(data_dir, cities=None):
+    """List every Data/<city>/<year>.csv file, optionally limited to some cities"""
+    csv_files = sorted(glob.glob(os.path.join(data_dir, "*", "*.csv")))
+    if cities:
+        csv_files = [path for path in csv_files if os.path.basename(os.path.dirname(path)) in cities]
+    return csv_files
+
+
+def ingest(data_dir=DATA_DIR, cities=None, force=False):
+    """Build or refresh the columnar copies and return (rebuilt, skipped, failed) counts"""
+    rebuilt = skipped = failed = 0
+    for csv_file in find_source_files(data_dir, cities):
+        name = os.path.relpath(csv_file, data_dir)
+        if not force and columnar_store.is_fresh(csv_file):
+            skipped += 1
+            continue
+        started = time.perf_counter()
+        try:
+            meta = columnar_store.write_store(csv_file)
+        except Exception as e:
+            print(f"Error ingesting {name}: {str(e)}")
+            failed += 1
+            continue
+        rebuilt += 1
+        print(f"Ingested {name}: {meta['rows']} rows in {time.perf_counter() - started:.2f}s")
+    return rebuilt, skipped, failed
+
+
+def build_rollups(data_dir=DATA_DIR, cities=None):
+    """Build the rollups of every city and standard pollutant whose source files changed"""
+    schema_index = SchemaIndex(POLLUTANT_MAP)
+    store = RollupStore(data_dir, lambda city, pollutant: load_city_series(data_dir, city, pollutant, schema_index))
+    for city in sorted({os.path.basename(os.path.dirname(path)) for path in find_source_files(data_dir, cities)}):
+        started = time.perf_counter()
+        builds = store.builds
+        for pollutant in STANDARD_POLLUTANTS:
+            try:
+                store.get(city, pollutant)
+            except Exception as e:
+                print(f"Error building {pollutant} rollups for {city}: {str(e)}")
+        if store.builds > builds:
+            print(f"Rolled up {city}: {store.builds - builds} pollutants in {time.perf_counter() - started:.2f}s")
+    return store.builds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the columnar store for the Data/ directory")
+    parser.add_argument("cities", nargs="*", help="Only ingest these cities (default: all)")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Directory containing <city>/<year>.csv files")
+    parser.add_argument("--force", action="store_true", help="Rebuild files even if they are up to date")
+    args = parser.parse_args()
+
+    rebuilt, skipped, failed = ingest(args.data_dir, args.cities, args.force)
+    print(f"Store directory: {columnar_store.STORE_DIR}")
+    print(f"Rebuilt {rebuilt}, skipped {skipped} up-to-date, {failed} failed")
+    print(f"Built {build_rollups(args.data_dir, args.cities)} rollup tables")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
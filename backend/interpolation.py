@@ -0,0 +1,76 @@
+"""
+Inverse-distance-weighted (IDW) interpolation of station values onto a grid.
+
+The weights only depend on the grid and the station coordinates, so they
+are computed once as a (cells x stations) matrix and every field is a
+matrix product with the station values. Stations without a value in the
+requested window are left out by renormalizing the weights of the others.
+Callers cache the interpolated grids (see render_cache.LRUCache) so
+repeated renders are a dictionary lookup.
+"""
+import numpy as np
+
+from spatial_index import haversine_km
+
+# Exponent of the inverse distance; 2 is the usual choice for IDW
+IDW_POWER = 2.0
+
+# Distance (km) below which a cell takes the station value as is
+SNAP_KM = 1e-3
+
+# Size of a grid cell in degrees (about 280 m)
+GRID_CELL_DEG = 0.0025
+
+
+def make_grid(south, west, north, east, rows, cols):
+    """Return (lats, lons) of the cell centers of a rows x cols grid, flattened row by row"""
+    lat_step = (north - south) / rows
+    lon_step = (east - west) / cols
+    lats = south + lat_step * (np.arange(rows) + 0.5)
+    lons = west + lon_step * (np.arange(cols) + 0.5)
+    grid_lats, grid_lons = np.meshgrid(lats, lons, indexing="ij")
+    return grid_lats.ravel(), grid_lons.ravel()
+
+
+def grid_shape(south, west, north, east, cell_deg=GRID_CELL_DEG):
+    """Return (rows, cols) of a grid covering the bounds with cells of about cell_deg"""
+    return max(1, round((north - south) / cell_deg)), max(1, round((east - west) / cell_deg))
+
+
+def station_bounds(lats, lons, margin_deg=0.02):
+    """Return (south, west, north, east) around the stations with a margin"""
+    return (min(lats) - margin_deg, min(lons) - margin_deg, max(lats) + margin_deg, max(lons) + margin_deg)
+
+
+def idw_weights(grid_lats, grid_lons, station_lats, station_lons, power=IDW_POWER):
+    """
+    Return the (cells x stations) matrix of unnormalized IDW weights. A cell
+    on top of a station gets weight 1 for that station and 0 for the others.
+    """
+    station_lats = np.asarray(station_lats, dtype=np.float64)
+    station_lons = np.asarray(station_lons, dtype=np.float64)
+    distances = np.stack(
+        [haversine_km(lat, lon, grid_lats, grid_lons) for lat, lon in zip(station_lats, station_lons)],
+        axis=1,
+    )
+    snapped = distances < SNAP_KM
+    weights = 1.0 / np.maximum(distances, SNAP_KM) ** power
+    on_station = snapped.any(axis=1)
+    weights[on_station] = snapped[on_station].astype(np.float64)
+    return weights
+
+
+def interpolate(weights, values):
+    """
+    Interpolate station values with an IDW weight matrix.
+
+    `values` is a (stations,) vector or a (stations, frames) matrix; NaN marks
+    a station without data. Cells with no usable station become NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    available = ~np.isnan(values)
+    filled = np.where(available, values, 0.0)
+    numerator = weights @ filled
+    denominator = weights @ available.astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1.0), np.nan)
@@ -0,0 +1,53 @@
+"""
+Thread pool for loading a city's year files concurrently.
+
+Reading and decoding one CSV or store file is independent of the others,
+and pandas/numpy release the GIL for most of that work, so the per-city
+endpoints hand each file to this pool and merge the results in year order.
+Threads (rather than processes) keep the shared dataset, schema and time
+caches usable from every worker.
+"""
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of files loaded at once (1 loads serially)
+LOADER_WORKERS = max(1, int(os.environ.get("LOADER_WORKERS", str(min(8, os.cpu_count() or 1)))))
+
+_executor = None
+
+
+def get_executor():
+    """Return the shared loader pool, creating it on first use"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=LOADER_WORKERS, thread_name_prefix="loader")
+    return _executor
+
+
+def year_order(paths):
+    """Sort <year>.csv (or *_<year>.csv) paths by year, then by name"""
+    def key(path):
+        match = re.search(r"(\d{4})\.csv$", os.path.basename(path))
+        return (int(match.group(1)) if match else 0, os.path.basename(path))
+    return sorted(paths, key=key)
+
+
+def map_files(func, paths, *args):
+    """
+    Yield func(path, *args) for each path in year order. Files are loaded
+    concurrently; results are yielded as soon as every earlier file is done.
+    """
+    paths = year_order(paths)
+    if LOADER_WORKERS == 1 or len(paths) <= 1:
+        for path in paths:
+            yield func(path, *args)
+        return
+    futures = [get_executor().submit(func, path, *args) for path in paths]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        # The consumer stopped early (e.g. a 404 check or a closed stream)
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,168 @@
+"""
+In-memory index of the forecast files under FutureData/.
+
+Every `<model>/<city>/<model>_Predicted_<year>.csv` is read once and held as
+NumPy arrays keyed by (model, city, year, column): the timestamps, date
+labels and values of the rows where that column has a value. Requests are
+answered by looking the arrays up instead of reading and iterating the CSV.
+Files with an up-to-date cleaned artifact (see forecast_pipeline.py) are
+loaded from it instead. Each lookup stats the file and its artifact, and a
+file where either changed (or that appeared since) is read again; deleted
+files are dropped.
+"""
+import glob
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dataset_cache import file_signature
+from forecast_artifacts import artifact_is_fresh, artifact_signature, load_artifact, read_artifact_meta
+from loader_pool import map_files
+from schema_index import resolve_date_column
+from timestamps import format_dates, parse_date_column
+
+PREDICTION_FILE = re.compile(r"(?P<model>.+)_Predicted_(?P<year>\d{4})\.csv$")
+
+
+def prediction_path(future_data_dir, model, city, year):
+    """Return the path of a model's forecast file for a city and year"""
+    return os.path.join(future_data_dir, model, city, f"{model}_Predicted_{year}.csv")
+
+
+def load_prediction_file(csv_file, year):
+    """
+    Read a forecast file into {column: {"timestamp", "date", "value"}}, keeping
+    only the rows where the column has a value. Runs on the loader pool.
+    """
+    meta = read_artifact_meta(csv_file)
+    if artifact_is_fresh(csv_file, meta):
+        timestamps, values, date_format = load_artifact(csv_file, meta)
+        labels = format_dates(timestamps, date_format).astype(str)
+        return {
+            name: {"timestamp": timestamps[mask], "date": labels[mask], "value": column[mask]}
+            for name, column in values.items()
+            for mask in [~np.isnan(column)]
+        }
+
+    df = pd.read_csv(csv_file)
+    date_column = resolve_date_column(list(df.columns))
+    if date_column:
+        parsed = parse_date_column(df[date_column])
+        timestamps, labels = parsed.timestamps, parsed.labels
+    else:
+        timestamps = np.full(len(df), np.datetime64("NaT"), dtype="datetime64[ns]")
+        labels = np.full(len(df), None, dtype=object)
+    # Rows without a date fall back to the first day of the file's year
+    labels = np.where(pd.isna(labels), f"{year}-01-01", labels).astype(str)
+
+    columns = {}
+    for name in df.columns:
+        if name == date_column:
+            continue
+        values = pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64)
+        mask = ~np.isnan(values)
+        columns[name] = {"timestamp": timestamps[mask], "date": labels[mask], "value": values[mask]}
+    return columns
+
+
+class PredictionStore:
+    """Forecast arrays per (model, city, year, column), reloaded when a file changes"""
+
+    def __init__(self, future_data_dir):
+        self.future_data_dir = future_data_dir
+        self._files = {}  # (model, city, year) -> (signature, {column: arrays})
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def load_all(self):
+        """Read every forecast file up front (files already loaded and unchanged are skipped)"""
+        paths = []
+        for path in glob.glob(os.path.join(self.future_data_dir, "*", "*", "*.csv")):
+            model_dir, city = os.path.split(os.path.dirname(path))
+            match = PREDICTION_FILE.match(os.path.basename(path))
+            if match and match.group("model") == os.path.basename(model_dir):
+                paths.append(path)
+        # The pool loads the files concurrently; results come back in year order
+        for _ in map_files(self._load_path, paths):
+            pass
+        return len(paths)
+
+    def _load_path(self, path):
+        model_dir, city = os.path.split(os.path.dirname(path))
+        year = PREDICTION_FILE.match(os.path.basename(path)).group("year")
+        try:
+            return self.get(os.path.basename(model_dir), city, year)
+        except Exception as e:
+            print(f"Error loading {path}: {str(e)}")
+            return None
+
+    def get(self, model, city, year):
+        """Return {column: {"timestamp", "date", "value"}} for a forecast file, or None if it does not exist"""
+        key = (model, city, year)
+        path = prediction_path(self.future_data_dir, model, city, year)
+        try:
+            signature = (file_signature(path), artifact_signature(path))
+        except OSError:
+            with self._lock:
+                self._files.pop(key, None)
+            return None
+
+        with self._lock:
+            entry = self._files.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+
+        columns = load_prediction_file(path, year)
+        with self._lock:
+            self._files[key] = (signature, columns)
+            self.loads += 1
+        return columns
+
+    def series(self, model, city, year, column):
+        """Return the arrays of one forecast column, or None if the file or column does not exist"""
+        columns = self.get(model, city, year)
+        if columns is None:
+            return None
+        return columns.get(column)
+
+    def city_version(self, city):
+        """Describe the current state of every model's forecast files (and artifacts) for a city"""
+        entries = []
+        for path in sorted(glob.glob(os.path.join(self.future_data_dir, "*", city, "*.csv"))):
+            try:
+                entries.append((os.path.relpath(path, self.future_data_dir), file_signature(path), artifact_signature(path)))
+            except OSError:
+                continue
+        return tuple(entries)
+
+    def stats(self):
+        with self._lock:
+            return {"files": len(self._files), "loads": self.loads}
+
+
+def align_series(series):
+    """
+    Align several (timestamps, values) series on the union of their timestamps
+    in one pass. Returns (timestamps, matrix) with one matrix row per series and
+    NaN where a series has no value; repeated timestamps within a series are
+    averaged and rows without a valid timestamp are left out.
+    """
+    rows = np.concatenate(
+        [np.full(len(values), row) for row, (_, values) in enumerate(series)] or [np.empty(0, dtype=np.int64)]
+    )
+    timestamps = np.concatenate([ts for ts, _ in series] or [np.empty(0, dtype="datetime64[ns]")])
+    values = np.concatenate([values for _, values in series] or [np.empty(0)])
+    keep = ~np.isnat(timestamps) & ~np.isnan(values)
+    rows, timestamps, values = rows[keep].astype(np.int64), timestamps[keep], values[keep]
+
+    dates, columns = np.unique(timestamps, return_inverse=True)
+    cells = rows * len(dates) + columns
+    size = len(series) * len(dates)
+    sums = np.bincount(cells, weights=values, minlength=size)
+    counts = np.bincount(cells, minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        matrix = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+    return dates, matrix.reshape(len(series), len(dates))
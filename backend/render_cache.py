@@ -0,0 +1,76 @@
+"""
+Cache of rendered pages (HTML or other text) with ETags.
+
+Entries are keyed by the request parameters plus a data version chosen by
+the caller, so a changed source file produces a new key rather than
+needing explicit invalidation. The least recently used pages are dropped
+once RENDER_CACHE_SIZE entries are held. LRUCache is the same cache for
+values other than pages (interpolated grids, for instance).
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# Number of rendered pages kept in memory
+RENDER_CACHE_SIZE = int(os.environ.get("RENDER_CACHE_SIZE", "128"))
+
+
+def make_etag(content):
+    """Return a strong ETag for a str or bytes body"""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return '"' + hashlib.sha1(content).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """Check an If-None-Match header value against an ETag"""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    # Weak comparison, as required for If-None-Match
+    return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
+
+
+class LRUCache:
+    """Thread-safe LRU cache of values built on demand"""
+
+    def __init__(self, max_entries=RENDER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key, build):
+        """Return the cached value for `key`, calling `build()` on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = build()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "hits": self.hits, "misses": self.misses}
+
+
+class RenderCache(LRUCache):
+    """LRU cache of rendered (content, etag) pairs"""
+
+    def get_or_render(self, key, render):
+        """Return the cached (content, etag) for `key`, calling `render()` on a miss"""
+        def build():
+            content = render()
+            return content, make_etag(content)
+        return self.get_or_build(key, build)
@@ -0,0 +1,141 @@
+"""
+Vectorized resampling and downsampling of time series.
+
+`resample_series` groups points into hour/day/week/month buckets with
+mean/min/max/count aggregates using sorted NumPy reductions, and
+`lttb_indices` picks a visually representative subset of points with the
+Largest-Triangle-Three-Buckets algorithm so responses fit a point budget.
+"""
+import numpy as np
+
+RAW_RESOLUTION = "raw"
+RESOLUTIONS = (RAW_RESOLUTION, "hour", "day", "week", "month")
+AGGREGATE_KEYS = ("min", "max", "count")
+
+# numpy datetime units used to label buckets of each resolution
+LABEL_UNITS = {"raw": "m", "hour": "m", "day": "D", "week": "D", "month": "M", "year": "Y"}
+
+
+def bucket_starts(timestamps, resolution):
+    """Floor datetime64 timestamps to the start of their hour/day/week (Monday)/month/year"""
+    if resolution == "hour":
+        return timestamps.astype("datetime64[h]").astype("datetime64[ns]")
+    if resolution == "day":
+        return timestamps.astype("datetime64[D]").astype("datetime64[ns]")
+    if resolution == "week":
+        days = timestamps.astype("datetime64[D]")
+        # 1970-01-01 was a Thursday, so (days + 3) % 7 is 0 on Mondays
+        weekday = (days.astype(np.int64) + 3) % 7
+        return (days - weekday.astype("timedelta64[D]")).astype("datetime64[ns]")
+    if resolution == "month":
+        return timestamps.astype("datetime64[M]").astype("datetime64[ns]")
+    if resolution == "year":
+        return timestamps.astype("datetime64[Y]").astype("datetime64[ns]")
+    return timestamps
+
+
+def resample_series(timestamps, values, resolution):
+    """
+    Aggregate a series into buckets of the given resolution.
+
+    Returns a dict of equal-length arrays sorted by time: "timestamp" (bucket
+    start), "value" (mean), "min", "max" and "count". Points with a missing
+    timestamp or value are dropped. With the raw resolution every point is its
+    own bucket.
+    """
+    valid = ~np.isnat(timestamps) & ~np.isnan(values)
+    timestamps = timestamps[valid]
+    values = values[valid].astype(np.float64)
+
+    if resolution == RAW_RESOLUTION:
+        order = np.argsort(timestamps, kind="stable")
+        values = values[order]
+        return {
+            "timestamp": timestamps[order],
+            "value": values,
+            "min": values,
+            "max": values,
+            "count": np.ones(len(values), dtype=np.int64),
+        }
+
+    buckets = bucket_starts(timestamps, resolution)
+    order = np.argsort(buckets, kind="stable")
+    buckets = buckets[order]
+    values = values[order]
+    if len(values) == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return {"timestamp": buckets, "value": empty, "min": empty, "max": empty,
+                "count": np.empty(0, dtype=np.int64)}
+
+    # Each bucket is a contiguous run in sorted order; reduce the runs in one pass
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    counts = np.diff(np.append(starts, len(values)))
+    return {
+        "timestamp": buckets[starts],
+        "value": np.add.reduceat(values, starts) / counts,
+        "min": np.minimum.reduceat(values, starts),
+        "max": np.maximum.reduceat(values, starts),
+        "count": counts.astype(np.int64),
+    }
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Return the indices of `threshold` points chosen by Largest-Triangle-Three-Buckets.
+    `x` must be sorted. The first and last points are always kept.
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1][:threshold], dtype=np.int64)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Interior points are split into threshold - 2 buckets
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[hi:next_hi].mean()
+        next_y = y[hi:next_hi].mean()
+        # Twice the area of the triangle (previous point, candidate, next bucket average)
+        area = np.abs(
+            (x[previous] - next_x) * (y[lo:hi] - y[previous])
+            - (x[previous] - x[lo:hi]) * (next_y - y[previous])
+        )
+        previous = lo + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample(series, max_points):
+    """Apply LTTB on a resampled series (as returned by resample_series) to fit max_points"""
+    if max_points is None or len(series["value"]) <= max_points:
+        return series
+    keep = lttb_indices(series["timestamp"].astype(np.int64), series["value"], max_points)
+    return {key: values[keep] for key, values in series.items()}
+
+
+def label_buckets(timestamps, resolution):
+    """Format bucket starts as ISO strings (e.g. 2023-01-05, 2023-01, 2023-01-05 13:00)"""
+    if len(timestamps) == 0:
+        return []
+    labels = np.datetime_as_string(timestamps, unit=LABEL_UNITS[resolution])
+    return np.char.replace(labels, "T", " ").tolist()
+
+
+def split_by_year(series):
+    """Split a time-sorted series into [(year, arrays)] runs, one per calendar year"""
+    years = series["timestamp"].astype("datetime64[Y]").astype(np.int64) + 1970
+    starts = np.flatnonzero(np.concatenate(([True], years[1:] != years[:-1]))) if len(years) else []
+    bounds = list(starts) + [len(years)]
+    return [
+        (str(years[lo]), {key: values[lo:hi] for key, values in series.items()})
+        for lo, hi in zip(bounds[:-1], bounds[1:])
+    ]
@@ -0,0 +1,175 @@
+"""
+Alternative response encodings for the time-series endpoints.
+
+The default response is a single JSON object built in memory. The helpers
+here either serialize the same records incrementally from a generator of
+per-file batches, so memory stays flat and the first bytes leave before every
+file has been read, or return the series as parallel arrays with the shared
+fields sent once.
+"""
+import itertools
+import json
+import struct
+
+import numpy as np
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from blocking import iterate_blocking
+
+try:
+    import pyarrow as pa
+except ImportError:  # Optional, only needed for format=arrow
+    pa = None
+
+ARROW_AVAILABLE = pa is not None
+
+# Formats accepted by the `format` query parameter
+JSON_FORMAT = "json"
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",  # one JSON record per line
+    "json-stream": "application/json",  # the regular {"data": [...]} body, sent in chunks
+}
+
+BINARY_MEDIA_TYPES = {
+    "f32": "application/octet-stream",  # header + int64 epoch ms + float32 values
+    "arrow": "application/vnd.apache.arrow.stream",  # Arrow IPC stream (requires pyarrow)
+}
+
+# Leading bytes of the f32 format: magic, format version, header length
+F32_MAGIC = b"PHMS"
+F32_VERSION = 1
+F32_PREFIX = struct.Struct("<4sHI")
+
+# Values accepted by the `shape` query parameter
+RECORDS_SHAPE = "records"
+COLUMNS_SHAPE = "columns"
+
+# Number of records serialized into each chunk of a streamed response
+STREAM_CHUNK_ROWS = 5000
+
+
+def peek_batches(batches):
+    """
+    Return an iterator equivalent to `batches`, or None if it yields no records.
+    Used to answer 404 before a streamed response has started.
+    """
+    batches = iter(batches)
+    for batch in batches:
+        if batch:
+            return itertools.chain([batch], batches)
+    return None
+
+
+def _encode_chunks(batches, separator, terminator):
+    first = True
+    for batch in batches:
+        for start in range(0, len(batch), STREAM_CHUNK_ROWS):
+            body = separator.join(json.dumps(record) for record in batch[start:start + STREAM_CHUNK_ROWS])
+            if separator == ",":
+                yield body if first else "," + body
+            else:
+                yield body + terminator
+            first = False
+
+
+def streaming_records_response(batches, fmt, key="data"):
+    """Stream record batches as NDJSON lines or as a chunked {"data": [...]} document"""
+    if fmt == "ndjson":
+        content = _encode_chunks(batches, "\n", "\n")
+    else:
+        content = itertools.chain(
+            ['{"%s":[' % key],
+            _encode_chunks(batches, ",", ""),
+            [']}'],
+        )
+    # Chunks are encoded on the blocking executor, so streams count towards its bound
+    return StreamingResponse(iterate_blocking(content), media_type=STREAM_MEDIA_TYPES[fmt])
+
+
+def columns_payload(parts, meta, value_key="value", include_coords=False, extra_keys=()):
+    """
+    Build a {"meta": ..., "columns": ...} document from (year, arrays) parts.
+
+    Each year is described once in meta["years"] as a slice of the parallel
+    arrays instead of being repeated on every point. `extra_keys` names
+    further per-point arrays to include (for example aggregates).
+    """
+    names = ["date", value_key] + list(extra_keys) + (["latitude", "longitude"] if include_coords else [])
+    columns = {name: [] for name in names}
+    years = []
+    count = 0
+    for year, part in parts:
+        size = len(part["date"])
+        years.append({"year": year, "start": count, "count": size})
+        count += size
+        columns["date"].extend(part["date"])
+        columns[value_key].extend(part["value"].tolist())
+        for key in extra_keys:
+            columns[key].extend(part[key].tolist())
+        if include_coords:
+            columns["latitude"].extend(part["latitude"].tolist())
+            columns["longitude"].extend(part["longitude"].tolist())
+    return {"meta": dict(meta, count=count, years=years), "columns": columns}
+
+
+def columns_response(parts, meta, value_key="value", include_coords=False, extra_keys=()):
+    """Return columns_payload(...) as a response"""
+    # The content is already plain lists, so skip FastAPI's per-item encoder
+    return JSONResponse(columns_payload(parts, meta, value_key, include_coords, extra_keys))
+
+
+def _concat_arrays(parts):
+    """Concatenate (year, {"timestamp", "value"}) parts into epoch-ms and float32 arrays"""
+    years = []
+    timestamps = []
+    values = []
+    count = 0
+    for year, part in parts:
+        size = len(part["value"])
+        years.append({"year": year, "start": count, "count": size})
+        count += size
+        # NaT maps to the smallest int64, which is what numpy stores for it
+        timestamps.append(part["timestamp"].astype("datetime64[ms]").view("<i8"))
+        values.append(part["value"].astype("<f4"))
+    if not values:
+        return years, np.empty(0, dtype="<i8"), np.empty(0, dtype="<f4")
+    return years, np.concatenate(timestamps), np.concatenate(values)
+
+
+def binary_series_response(parts, fmt, meta):
+    """
+    Encode (year, {"timestamp", "value"}) parts as a binary series.
+
+    The f32 layout is: 4-byte magic "PHMS", uint16 version and uint32 header
+    length (little-endian), a UTF-8 JSON header padded with spaces to a
+    multiple of 8 bytes, then `count` int64 epoch milliseconds followed by
+    `count` float32 values. Missing timestamps are encoded as the minimum int64.
+    """
+    years, timestamps, values = _concat_arrays(parts)
+    meta = dict(meta, count=int(len(values)), years=years)
+
+    if fmt == "arrow":
+        table = pa.table(
+            {
+                "timestamp": pa.array(timestamps.view("datetime64[ms]"), type=pa.timestamp("ms")),
+                "value": pa.array(values, type=pa.float32()),
+            },
+            metadata={"meta": json.dumps(meta)},
+        )
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(sink.getvalue().to_pybytes(), media_type=BINARY_MEDIA_TYPES[fmt])
+
+    header = json.dumps(dict(meta, fields=[
+        {"name": "timestamp", "dtype": "<i8", "unit": "ms"},
+        {"name": "value", "dtype": "<f4"},
+    ])).encode("utf-8")
+    header += b" " * (-(F32_PREFIX.size + len(header)) % 8)
+    body = b"".join([
+        F32_PREFIX.pack(F32_MAGIC, F32_VERSION, len(header)),
+        header,
+        timestamps.tobytes(),
+        values.tobytes(),
+    ])
+    return Response(body, media_type=BINARY_MEDIA_TYPES[fmt])
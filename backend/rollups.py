@@ -0,0 +1,205 @@
+"""
+Precomputed daily, monthly and yearly summaries per station and pollutant.
+
+Rollups are built from the hourly series the first time a (city, pollutant)
+pair is requested, or ahead of time by ingest.py, and saved as .npz files
+under STORE_DIR/rollups. Each set records the mtime and size of the city's
+CSV files it was built from and is rebuilt when any of them change.
+Summary requests are then answered from memory without touching raw data.
+"""
+import glob
+import json
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+import columnar_store
+from loader_pool import map_files
+from resample import bucket_starts, label_buckets
+from timestamps import parse_timestamps
+
+ROLLUP_DIR = os.path.join(columnar_store.STORE_DIR, "rollups")
+
+PERIODS = ("day", "month", "year")
+PERCENTILES = {"p50": 0.50, "p90": 0.90, "p95": 0.95}
+STATS = ("mean", "min", "max", "count") + tuple(PERCENTILES)
+
+# Length of a window label for each period ("2023", "2023-05", "2023-05-01")
+WINDOW_LENGTHS = {4: "year", 7: "month", 10: "day"}
+
+
+def window_period(window):
+    """
+    Map a window ("all", "YYYY", "YYYY-MM" or "YYYY-MM-DD") to (period, start),
+    start being the timestamp the rollup tables use for that period. "all" gives
+    (None, None). Raises ValueError for anything else.
+    """
+    if window == "all":
+        return None, None
+    period = WINDOW_LENGTHS.get(len(window))
+    if period is not None and re.fullmatch(r"\d{4}(-\d{2}){0,2}", window):
+        try:
+            return period, np.datetime64(window, "ns")
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid window '{window}'. Use all, YYYY, YYYY-MM or YYYY-MM-DD")
+
+
+def city_version(data_dir, city):
+    """Describe the current state of a city's CSV files (names, mtimes and sizes)"""
+    entries = []
+    for csv_file in sorted(glob.glob(os.path.join(data_dir, city, "*.csv"))):
+        stat = os.stat(csv_file)
+        entries.append([os.path.basename(csv_file), stat.st_mtime_ns, stat.st_size])
+    return json.dumps(entries)
+
+
+def read_file_series(csv_file, date_column, column):
+    """Read one file's (timestamps, values), from the columnar store where fresh and from the CSV otherwise"""
+    if columnar_store.is_fresh(csv_file):
+        return np.asarray(columnar_store.load_index(csv_file)), columnar_store.load_column(csv_file, column)
+    df = pd.read_csv(csv_file, usecols=[date_column, column])
+    parsed, _ = parse_timestamps(df[date_column])
+    return parsed.to_numpy(dtype="datetime64[ns]"), pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64)
+
+
+def load_city_series(data_dir, city, pollutant, schema_index, read_file=read_file_series):
+    """
+    Read the full hourly series of a pollutant for a city as (timestamps, values)
+    arrays, with the files loaded concurrently on the loader pool. This is the
+    only loader rollups are built from; `read_file(csv_file, date_column, column)`
+    reads one file, and the API passes one that goes through its caches.
+    """
+    def load(csv_file):
+        schema = schema_index.get(csv_file)
+        column = schema["pollutants"].get(pollutant)
+        if not column or not schema["date_column"]:
+            return None
+        timestamps, values = read_file(csv_file, schema["date_column"], column)
+        return np.asarray(timestamps, dtype="datetime64[ns]"), np.asarray(values, dtype=np.float64)
+
+    parts = [part for part in map_files(load, glob.glob(os.path.join(data_dir, city, "*.csv"))) if part is not None]
+    if not parts:
+        return None
+    return np.concatenate([timestamps for timestamps, _ in parts]), np.concatenate([values for _, values in parts])
+
+
+def compute_rollups(timestamps, values):
+    """
+    Aggregate an hourly series into {period: {"timestamp", stat...}} tables.
+    Percentiles use linear interpolation, like np.percentile.
+    """
+    valid = ~np.isnat(timestamps) & ~np.isnan(values)
+    timestamps = timestamps[valid]
+    values = values[valid].astype(np.float64)
+
+    rollups = {}
+    for period in PERIODS:
+        buckets = bucket_starts(timestamps, period)
+        # Sort by bucket, then value, so every bucket is a sorted run
+        order = np.lexsort((values, buckets))
+        sorted_buckets = buckets[order]
+        sorted_values = values[order]
+        if len(sorted_values) == 0:
+            table = {stat: np.empty(0, dtype=np.float64) for stat in STATS}
+            table["timestamp"] = sorted_buckets
+            table["count"] = np.empty(0, dtype=np.int64)
+            rollups[period] = table
+            continue
+
+        starts = np.flatnonzero(np.concatenate(([True], sorted_buckets[1:] != sorted_buckets[:-1])))
+        counts = np.diff(np.append(starts, len(sorted_values)))
+        table = {
+            "timestamp": sorted_buckets[starts],
+            "mean": np.add.reduceat(sorted_values, starts) / counts,
+            "min": sorted_values[starts],
+            "max": sorted_values[starts + counts - 1],
+            "count": counts.astype(np.int64),
+        }
+        for name, q in PERCENTILES.items():
+            position = starts + q * (counts - 1)
+            lower = np.floor(position).astype(np.int64)
+            upper = np.ceil(position).astype(np.int64)
+            fraction = position - lower
+            table[name] = sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+        rollups[period] = table
+    return rollups
+
+
+class RollupStore:
+    """In-memory and on-disk cache of rollups keyed by (city, pollutant)"""
+
+    def __init__(self, data_dir, loader, rollup_dir=ROLLUP_DIR):
+        self.data_dir = data_dir
+        self.loader = loader  # loader(city, pollutant) -> (timestamps, values) or None
+        self.rollup_dir = rollup_dir
+        self._entries = {}  # (city, pollutant) -> (version, rollups)
+        self._lock = threading.Lock()
+        self._build_locks = {}  # (city, pollutant) -> lock held while that key is built
+        self.builds = 0
+
+    def get(self, city, pollutant):
+        """Return {period: table} for a city and pollutant, building it if needed"""
+        key = (city, pollutant)
+        version = city_version(self.data_dir, city)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        # One build per key at a time; concurrent callers wait and reuse its result
+        with build_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+
+            rollups = self._read(city, pollutant, version)
+            if rollups is None:
+                series = self.loader(city, pollutant)
+                if series is None:
+                    rollups = compute_rollups(np.empty(0, dtype="datetime64[ns]"), np.empty(0))
+                else:
+                    rollups = compute_rollups(*series)
+                self._write(city, pollutant, version, rollups)
+                self.builds += 1
+
+            # Labels are formatted once so requests only slice lists
+            for period, table in rollups.items():
+                table["date"] = label_buckets(table["timestamp"], period)
+            with self._lock:
+                self._entries[key] = (version, rollups)
+        return rollups
+
+    def _path(self, city, pollutant):
+        return os.path.join(self.rollup_dir, city, f"{pollutant}.npz")
+
+    def _read(self, city, pollutant, version):
+        path = self._path(city, pollutant)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data["version"]) != version:
+                    return None
+                return {
+                    period: {name: data[f"{period}_{name}"] for name in ("timestamp",) + STATS}
+                    for period in PERIODS
+                }
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Error reading rollups {path}: {str(e)}")
+            return None
+
+    def _write(self, city, pollutant, version, rollups):
+        path = self._path(city, pollutant)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = {"version": np.array(version)}
+        for period, table in rollups.items():
+            for name, values in table.items():
+                arrays[f"{period}_{name}"] = values
+        # A unique temp file per writer, so other processes building the same key do not collide
+        columnar_store.replace_file(path, lambda f: np.savez(f, **arrays))
@@ -0,0 +1,73 @@
+"""
+Per-file header index.
+
+Records, for every data file, which column holds the date and which alias
+each standard pollutant uses. It is built from the header row only (or from
+the columnar store metadata) and revalidated by mtime and size, so requests
+can pick the columns they need before reading any data.
+"""
+import os
+import threading
+
+import pandas as pd
+
+import columnar_store
+from dataset_cache import file_signature
+
+
+def resolve_date_column(columns):
+    """Return the column that holds the date or timestamp, or None"""
+    for col_name in ['Date', 'Timestamp']:
+        if col_name in columns:
+            return col_name
+    for col in columns:
+        if 'date' in col.lower() or 'time' in col.lower():
+            return col
+    return None
+
+
+def resolve_pollutant_columns(columns, pollutant_map):
+    """Map each standard pollutant name to the alias used in this column list"""
+    resolved = {}
+    for pollutant, aliases in pollutant_map.items():
+        for alias in aliases:
+            if alias in columns:
+                resolved[pollutant] = alias
+                break
+    return resolved
+
+
+class SchemaIndex:
+    """Cache of header information keyed by file path"""
+
+    def __init__(self, pollutant_map):
+        self.pollutant_map = pollutant_map
+        self._entries = {}  # path -> (signature, schema)
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """Return {"columns", "date_column", "pollutants", "has_location"} for a file"""
+        path = os.path.abspath(path)
+        signature = file_signature(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+
+        schema = self._build(path)
+        with self._lock:
+            self._entries[path] = (signature, schema)
+        return schema
+
+    def _build(self, path):
+        meta = columnar_store.read_meta(path)
+        if columnar_store.is_fresh(path, meta):
+            columns = [meta["date_column"]] + [entry["name"] for entry in meta["columns"]]
+        else:
+            columns = list(pd.read_csv(path, nrows=0).columns)
+        return {
+            "columns": columns,
+            "date_column": resolve_date_column(columns),
+            "pollutants": resolve_pollutant_columns(columns, self.pollutant_map),
+            "has_location": 'Latitude' in columns and 'Longitude' in columns,
+        }
@@ -0,0 +1,160 @@
+"""
+Grid index over point coordinates for nearest-neighbour and radius queries.
+
+Points are bucketed into square cells of `cell_deg` degrees. A query only
+computes haversine distances for the points in the cells around the query
+location, growing the searched ring of cells until the remaining cells are
+provably farther than the results found. Results are ordered by partially
+sorting the candidates (np.argpartition) rather than sorting every point.
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Kilometres per degree of latitude (and of longitude at the equator)
+KM_PER_DEGREE = 2 * math.pi * EARTH_RADIUS_KM / 360
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance in km from (lat, lon) to arrays of coordinates"""
+    lat1 = np.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(lons) - np.radians(lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def closest(indices, distances, k):
+    """Return the k smallest distances (and their indices) in ascending order"""
+    if k < len(distances):
+        keep = np.argpartition(distances, k - 1)[:k]
+        indices, distances = indices[keep], distances[keep]
+    order = np.argsort(distances, kind="stable")
+    return indices[order], distances[order]
+
+
+class SpatialIndex:
+    """Uniform grid over (lat, lon) points; positions refer to the input arrays"""
+
+    def __init__(self, lats, lons, cell_deg=0.05):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.cell_deg = cell_deg
+        self.size = len(self.lats)
+
+        rows = np.floor(self.lats / cell_deg).astype(np.int64)
+        cols = np.floor(self.lons / cell_deg).astype(np.int64)
+        self._cells = {}
+        if self.size:
+            # Group point positions by cell in one sort
+            order = np.lexsort((cols, rows))
+            keys = np.stack([rows[order], cols[order]], axis=1)
+            starts = np.flatnonzero(np.concatenate(([True], np.any(keys[1:] != keys[:-1], axis=1))))
+            for lo, hi in zip(starts, list(starts[1:]) + [self.size]):
+                self._cells[(int(keys[lo, 0]), int(keys[lo, 1]))] = order[lo:hi]
+            self._row_range = (int(rows.min()), int(rows.max()))
+            self._col_range = (int(cols.min()), int(cols.max()))
+
+    def _ring(self, row, col, radius):
+        """Positions of the points in the cells at Chebyshev distance `radius` from (row, col)"""
+        # Only the part of the ring inside the occupied rows and columns can hold points
+        row_lo, row_hi = max(row - radius, self._row_range[0]), min(row + radius, self._row_range[1])
+        col_lo, col_hi = max(col - radius, self._col_range[0]), min(col + radius, self._col_range[1])
+        found = []
+        for r in range(row_lo, row_hi + 1):
+            if abs(r - row) == radius:
+                cols = range(col_lo, col_hi + 1)
+            else:
+                cols = [c for c in (col - radius, col + radius) if col_lo <= c <= col_hi]
+            for c in cols:
+                cell = self._cells.get((r, c))
+                if cell is not None:
+                    found.append(cell)
+        return found
+
+    def _min_ring(self, row, col):
+        """Ring radius before which no cell holds points"""
+        return max(
+            0,
+            self._row_range[0] - row, row - self._row_range[1],
+            self._col_range[0] - col, col - self._col_range[1],
+        )
+
+    def _max_ring(self, row, col):
+        """Ring radius beyond which no cell holds points"""
+        return max(
+            abs(row - self._row_range[0]), abs(row - self._row_range[1]),
+            abs(col - self._col_range[0]), abs(col - self._col_range[1]),
+        )
+
+    def _ring_clearance_km(self, lat, radius):
+        """Lower bound on the distance from the query to any cell outside ring `radius`"""
+        # Longitude degrees are the shortest near the poles, so use the highest latitude reached
+        highest = min(89.0, abs(lat) + (radius + 1) * self.cell_deg)
+        return radius * self.cell_deg * KM_PER_DEGREE * math.cos(math.radians(highest))
+
+    def nearest(self, lat, lon, k=1, max_km=None):
+        """Return (positions, distances in km) of the k nearest points, nearest first"""
+        if not self.size or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        row = math.floor(lat / self.cell_deg)
+        col = math.floor(lon / self.cell_deg)
+        last_ring = self._max_ring(row, col)
+
+        candidates = []
+        count = 0
+        best = None
+        # Skip the empty rings between a far-away query and the occupied cells
+        for radius in range(self._min_ring(row, col), last_ring + 1):
+            ring = self._ring(row, col, radius)
+            candidates.extend(ring)
+            count += sum(len(cell) for cell in ring)
+            if count >= k:
+                positions = np.concatenate(candidates)
+                distances = haversine_km(lat, lon, self.lats[positions], self.lons[positions])
+                best = closest(positions, distances, k)
+                # Every unsearched point is at least this far away
+                if best[1][-1] <= self._ring_clearance_km(lat, radius):
+                    break
+        if best is None:
+            # Fewer than k points in total
+            positions = np.concatenate(candidates) if candidates else np.empty(0, dtype=np.int64)
+            distances = haversine_km(lat, lon, self.lats[positions], self.lons[positions])
+            best = closest(positions, distances, k)
+        if max_km is not None:
+            keep = best[1] <= max_km
+            best = (best[0][keep], best[1][keep])
+        return best
+
+    def within(self, lat, lon, radius_km, limit=None):
+        """Return (positions, distances in km) of the points within radius_km, nearest first"""
+        positions, distances = self.query_radius(lat, lon, radius_km)
+        return closest(positions, distances, limit if limit is not None else len(positions))
+
+    def query_radius(self, lat, lon, radius_km):
+        """Return (positions, distances in km) of the points within radius_km, in no particular order"""
+        if not self.size:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        # Cells overlapping the bounding box of the search circle
+        dlat = radius_km / KM_PER_DEGREE
+        dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(min(89.0, abs(lat) + dlat))), 1e-6))
+        row_lo, row_hi = math.floor((lat - dlat) / self.cell_deg), math.floor((lat + dlat) / self.cell_deg)
+        col_lo, col_hi = math.floor((lon - dlon) / self.cell_deg), math.floor((lon + dlon) / self.cell_deg)
+        row_lo, row_hi = max(row_lo, self._row_range[0]), min(row_hi, self._row_range[1])
+        col_lo, col_hi = max(col_lo, self._col_range[0]), min(col_hi, self._col_range[1])
+
+        cells = [
+            self._cells[(r, c)]
+            for r in range(row_lo, row_hi + 1)
+            for c in range(col_lo, col_hi + 1)
+            if (r, c) in self._cells
+        ]
+        if not cells:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        positions = np.concatenate(cells)
+        distances = haversine_km(lat, lon, self.lats[positions], self.lons[positions])
+        inside = distances <= radius_km
+        return positions[inside], distances[inside]
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from resample import lttb_indices, resample_series, split_by_year
+
+
+def hourly_series(seed=0, hours=24 * 120):
+    rng = np.random.default_rng(seed)
+    timestamps = np.datetime64("2022-12-20T00:00", "ns") + np.arange(hours) * np.timedelta64(1, "h")
+    values = rng.gamma(2.0, 20.0, hours)
+    values[rng.random(hours) < 0.1] = np.nan
+    # Shuffled, as rows arrive from several files
+    order = rng.permutation(hours)
+    return timestamps[order], values[order]
+
+
+@pytest.mark.parametrize("resolution, period", [("week", "W-SUN"), ("month", "M"), ("day", "D")])
+def test_resample_matches_pandas(resolution, period):
+    timestamps, values = hourly_series()
+    series = resample_series(timestamps, values, resolution)
+
+    frame = pd.DataFrame({"value": values}, index=pd.DatetimeIndex(timestamps)).dropna()
+    groups = frame.groupby(frame.index.to_period(period).start_time)["value"]
+    expected = groups.agg(["mean", "min", "max", "count"]).sort_index()
+
+    assert np.array_equal(series["timestamp"], expected.index.to_numpy(dtype="datetime64[ns]"))
+    assert np.allclose(series["value"], expected["mean"])
+    assert np.array_equal(series["min"], expected["min"])
+    assert np.array_equal(series["max"], expected["max"])
+    assert np.array_equal(series["count"], expected["count"])
+
+
+def test_weeks_start_on_monday():
+    series = resample_series(*hourly_series(), "week")
+    assert (pd.DatetimeIndex(series["timestamp"]).dayofweek == 0).all()
+
+
+@pytest.mark.parametrize("max_points", [3, 10, 257])
+def test_lttb_keeps_endpoints_and_returns_max_points(max_points):
+    rng = np.random.default_rng(1)
+    x = np.arange(5000, dtype=np.float64)
+    y = np.cumsum(rng.normal(size=5000))
+    indices = lttb_indices(x, y, max_points)
+    assert len(indices) == max_points
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert (np.diff(indices) > 0).all()
+
+
+def test_lttb_returns_everything_under_the_budget():
+    assert np.array_equal(lttb_indices(np.arange(5.0), np.arange(5.0), 10), np.arange(5))
+
+
+def test_split_by_year():
+    series = resample_series(*hourly_series(), "month")
+    parts = split_by_year(series)
+    assert [year for year, _ in parts] == ["2022", "2023"]
+    assert sum(len(part["value"]) for _, part in parts) == len(series["value"])
+    for year, part in parts:
+        assert (pd.DatetimeIndex(part["timestamp"]).year == int(year)).all()
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rollups import PERCENTILES, compute_rollups
+
+
+@pytest.mark.parametrize("period, unit", [("day", "D"), ("month", "M"), ("year", "Y")])
+def test_rollups_match_pandas(period, unit):
+    rng = np.random.default_rng(2)
+    hours = 24 * 500
+    timestamps = np.datetime64("2022-06-01T00:00", "ns") + np.arange(hours) * np.timedelta64(1, "h")
+    values = rng.gamma(2.0, 20.0, hours)
+    values[rng.random(hours) < 0.1] = np.nan
+    order = rng.permutation(hours)
+    table = compute_rollups(timestamps[order], values[order])[period]
+
+    frame = pd.DataFrame({"value": values, "bucket": timestamps.astype(f"datetime64[{unit}]")}).dropna()
+    groups = frame.groupby("bucket")["value"]
+
+    assert np.array_equal(table["timestamp"].astype(f"datetime64[{unit}]"), groups.mean().index.to_numpy())
+    assert np.allclose(table["mean"], groups.mean())
+    assert np.array_equal(table["min"], groups.min())
+    assert np.array_equal(table["max"], groups.max())
+    assert np.array_equal(table["count"], groups.count())
+    for name, fraction in PERCENTILES.items():
+        assert np.allclose(table[name], groups.quantile(fraction))
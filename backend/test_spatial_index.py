@@ -0,0 +1,45 @@
+import numpy as np
+
+from spatial_index import SpatialIndex, haversine_km
+from data_config import CITY_COORDS
+
+
+def brute_force(lats, lons, lat, lon, k):
+    distances = haversine_km(lat, lon, np.asarray(lats), np.asarray(lons))
+    order = np.argsort(distances, kind="stable")[:k]
+    return order, distances[order]
+
+
+def test_nearest_matches_brute_force_near_the_data():
+    rng = np.random.default_rng(0)
+    lats = 18.9 + rng.uniform(0, 0.2, 500)
+    lons = 72.8 + rng.uniform(0, 0.1, 500)
+    index = SpatialIndex(lats, lons, cell_deg=0.005)
+    for lat, lon in [(19.0, 72.85), (18.95, 72.82), (19.3, 72.7)]:
+        positions, distances = index.nearest(lat, lon, k=5)
+        expected_positions, expected_distances = brute_force(lats, lons, lat, lon, 5)
+        assert np.allclose(distances, expected_distances)
+        assert set(positions) == set(expected_positions)
+
+
+def test_nearest_far_away_query_skips_empty_rings():
+    lats = [coords[0] for coords in CITY_COORDS.values()]
+    lons = [coords[1] for coords in CITY_COORDS.values()]
+    index = SpatialIndex(lats, lons)
+    visited = []
+    ring = index._ring
+    index._ring = lambda row, col, radius: visited.append(radius) or ring(row, col, radius)
+    for lat, lon in [(0.0, 0.0), (-60.0, -120.0), (89.0, 179.0)]:
+        visited.clear()
+        positions, distances = index.nearest(lat, lon, k=3)
+        # The stations span a few cells; walking out from the query would take thousands of rings
+        assert len(visited) <= 10
+        expected_positions, expected_distances = brute_force(lats, lons, lat, lon, 3)
+        assert np.allclose(distances, expected_distances)
+        assert set(positions) == set(expected_positions)
+
+
+def test_within_far_away_query_is_empty():
+    index = SpatialIndex([18.91, 19.04], [72.80, 72.86])
+    positions, distances = index.within(-60.0, -120.0, 10.0)
+    assert len(positions) == 0 and len(distances) == 0
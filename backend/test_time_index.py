@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from time_index import parse_time_range
+
+
+@pytest.mark.parametrize("end, expected", [
+    ("2023", "2024-01-01"),
+    ("2023-01", "2023-02-01"),
+    ("2023-12", "2024-01-01"),
+    ("2023-01-31", "2023-02-01"),
+    ("2023-06-01T12:00", "2023-06-01T12:00"),
+])
+def test_end_covers_the_whole_period(end, expected):
+    assert parse_time_range(None, end)[1] == np.datetime64(expected, "ns")
+
+
+def test_offsets_are_rejected():
+    with pytest.raises(ValueError):
+        parse_time_range("2023-06-01T00:00+05:30")
+    with pytest.raises(ValueError):
+        parse_time_range(None, "2023-06-01T00:00Z")
+
+
+def test_inverted_range_is_rejected():
+    with pytest.raises(ValueError):
+        parse_time_range("2024", "2023")
@@ -0,0 +1,122 @@
+"""
+Sorted timestamp index per data file for time-range queries.
+
+Each file's timestamps are parsed once into a sorted datetime64 array (plus
+the sorting permutation when the file is not already in order) and kept
+until the file's mtime or size changes. Range lookups are two binary
+searches. Files whose name is a year outside the requested range are ruled
+out without being opened.
+"""
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dataset_cache import file_signature
+from timestamps import parse_timestamps
+
+
+# Length of the period an `end` value without a time of day covers
+DATE_PRECISIONS = (
+    (re.compile(r"\d{4}"), "Y"),
+    (re.compile(r"\d{4}-\d{2}"), "M"),
+    (re.compile(r"\d{4}-\d{2}-\d{2}"), "D"),
+)
+
+
+def parse_time_value(value):
+    """Parse one query value into a naive datetime64; station times are local, so offsets are rejected"""
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        raise ValueError(f"'{value}' has a time zone offset; use local time without one")
+    return np.datetime64(timestamp, "ns")
+
+
+def parse_time_range(start=None, end=None):
+    """
+    Turn `start`/`end` query values into a half-open [start, end) pair of
+    datetime64 values (either may be None). An `end` of a bare year, month or
+    date (2023, 2023-06, 2023-06-30) includes that whole period. Raises
+    ValueError for unparseable or inverted ranges.
+    """
+    start_value = parse_time_value(start) if start else None
+    end_value = None
+    if end:
+        end_value = parse_time_value(end)
+        for pattern, unit in DATE_PRECISIONS:
+            if pattern.fullmatch(end.strip()):
+                end_value = (end_value.astype(f"datetime64[{unit}]") + 1).astype("datetime64[ns]")
+                break
+    if start_value is not None and end_value is not None and start_value >= end_value:
+        raise ValueError("start must be before end")
+    return start_value, end_value
+
+
+def year_bounds(path):
+    """Return the [start, end) bounds implied by a <year>.csv file name, or None"""
+    match = re.fullmatch(r"(\d{4})", os.path.splitext(os.path.basename(path))[0])
+    if not match:
+        return None
+    year = int(match.group(1))
+    return np.datetime64(f"{year}-01-01", "ns"), np.datetime64(f"{year + 1}-01-01", "ns")
+
+
+class TimeIndex:
+    """Cache of sorted timestamp arrays keyed by file path"""
+
+    def __init__(self):
+        self._entries = {}  # path -> (signature, sorted timestamps, order or None, bounds or None)
+        self._lock = threading.Lock()
+
+    def may_overlap(self, path, start, end):
+        """Check, without reading the file, whether it can contain points in [start, end)"""
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is not None and entry[0] == file_signature(path):
+            bounds = entry[3]
+            if bounds is None:
+                return False
+        else:
+            bounds = year_bounds(path)
+            if bounds is None:
+                return True
+        return (start is None or bounds[1] > start) and (end is None or bounds[0] < end)
+
+    def select(self, path, start, end, load_dates):
+        """
+        Return the rows of a file with start <= timestamp < end, in file order,
+        as a slice or an array of positions. `load_dates()` supplies the file's
+        date column the first time the file is indexed.
+        """
+        timestamps, order = self._get(path, load_dates)
+        lo = 0 if start is None else int(np.searchsorted(timestamps, start, side="left"))
+        hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side="left"))
+        if order is None:
+            return slice(lo, max(lo, hi))
+        return np.sort(order[lo:hi])
+
+    def _get(self, path, load_dates):
+        path = os.path.abspath(path)
+        signature = file_signature(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                return entry[1], entry[2]
+
+        parsed, _ = parse_timestamps(load_dates())
+        timestamps = parsed.to_numpy(dtype="datetime64[ns]")
+        order = None
+        # NaT never compares as ordered, so files with missing stamps get a permutation
+        if len(timestamps) > 1 and not np.all(timestamps[:-1] <= timestamps[1:]):
+            order = np.argsort(timestamps, kind="stable")
+            timestamps = timestamps[order]
+
+        valid = timestamps[~np.isnat(timestamps)]
+        bounds = (valid[0], valid[-1] + np.timedelta64(1, "ns")) if len(valid) else None
+
+        with self._lock:
+            self._entries[path] = (signature, timestamps, order, bounds)
+        return timestamps, order
@@ -0,0 +1,127 @@
+"""
+Timestamp parsing helpers shared by the API and the offline tools.
+
+The station files use two layouts ("01-01-2018 00:00" for Colaba and
+"2018-01-01 00:00:00" elsewhere) and the prediction files use either
+"01-01-2025" or "2025-01-01", so parsing always uses an explicit format
+detected from the first non-empty value instead of per-row inference.
+`DateColumnCache` keeps the parsed column and its date labels per file.
+"""
+import datetime
+import os
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from dataset_cache import file_signature
+
+# Known timestamp layouts, paired with the layout of their date part
+TIMESTAMP_FORMATS = [
+    ('%d-%m-%Y %H:%M', '%d-%m-%Y'),
+    ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d'),
+    ('%Y-%m-%d %H:%M', '%Y-%m-%d'),
+    ('%d-%m-%Y %H:%M:%S', '%d-%m-%Y'),
+    ('%d-%m-%Y', '%d-%m-%Y'),
+    ('%Y-%m-%d', '%Y-%m-%d'),
+]
+
+
+def detect_timestamp_format(series):
+    """Return (timestamp format, date format) for a column of timestamp strings, or (None, None)"""
+    sample = series.dropna()
+    if sample.empty:
+        return None, None
+    value = str(sample.iloc[0]).strip()
+    for timestamp_format, date_format in TIMESTAMP_FORMATS:
+        try:
+            datetime.datetime.strptime(value, timestamp_format)
+            return timestamp_format, date_format
+        except ValueError:
+            continue
+    return None, None
+
+
+def parse_timestamps(series):
+    """
+    Parse a column of timestamp strings into datetime64 values in one pass.
+
+    Returns (parsed series, date format) where the date format reproduces the
+    date part of the original strings. Unparseable values become NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series, '%Y-%m-%d'
+    timestamp_format, date_format = detect_timestamp_format(series)
+    if timestamp_format is None:
+        return pd.to_datetime(series, errors='coerce', dayfirst=True), '%d-%m-%Y'
+    return pd.to_datetime(series, format=timestamp_format, errors='coerce'), date_format
+
+
+def format_dates(timestamps, date_format):
+    """
+    Format datetime64 values as date strings in bulk. Each distinct day is
+    formatted once; NaT becomes None.
+    """
+    days = timestamps.astype('datetime64[D]')
+    valid = ~np.isnat(days)
+    labels = np.full(len(days), None, dtype=object)
+    if valid.any():
+        unique_days, inverse = np.unique(days[valid], return_inverse=True)
+        unique_labels = pd.DatetimeIndex(unique_days).strftime(date_format).to_numpy(dtype=object)
+        labels[valid] = unique_labels[inverse]
+    return labels
+
+
+class ParsedDates(namedtuple('ParsedDates', ['timestamps', 'labels', 'date_format'])):
+    """Parsed form of a file's date column: datetime64[ns] values, date strings and their layout"""
+    __slots__ = ()
+
+    def take(self, rows):
+        """Select rows (a slice or positions), e.g. after narrowing a frame with iloc"""
+        return ParsedDates(self.timestamps[rows], self.labels[rows], self.date_format)
+
+
+def parse_date_column(series, date_format=None):
+    """
+    Parse a date/timestamp column into ParsedDates. `date_format` gives the
+    label layout of columns that are already datetime (e.g. from the columnar
+    store). Values that do not parse keep the date part of their raw text.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        parsed, date_format = series, date_format or '%Y-%m-%d'
+    else:
+        parsed, date_format = parse_timestamps(series)
+    timestamps = parsed.to_numpy(dtype='datetime64[ns]')
+    labels = format_dates(timestamps, date_format)
+
+    unparsed = np.isnat(timestamps) & series.notna().to_numpy()
+    if unparsed.any():
+        raw = series[unparsed].astype(str).str.split(' ', n=1).str[0]
+        labels[unparsed] = raw.to_numpy(dtype=object)
+    return ParsedDates(timestamps, labels, date_format)
+
+
+class DateColumnCache:
+    """Memoized ParsedDates per (file, column), validated by the file's mtime and size"""
+
+    def __init__(self):
+        self._entries = {}  # (path, column) -> (signature, ParsedDates)
+        self._lock = threading.Lock()
+
+    def get(self, path, column, series, date_format=None):
+        """
+        Return the ParsedDates of `column` in `path`. `series` must hold every
+        row of the file; it is only parsed when the file is new or changed.
+        """
+        key = (os.path.abspath(path), column)
+        signature = file_signature(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+
+        parsed = parse_date_column(series, date_format)
+        with self._lock:
+            self._entries[key] = (signature, parsed)
+        return parsed
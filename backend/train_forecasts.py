@@ -0,0 +1,174 @@
+"""
+Train a forecasting model per station and pollutant and write its forecasts
+into FutureData/ in the layout served by /api/prediction-data.
+
+Stations are trained in parallel on a process pool. Fitted models are cached
+(see forecasting.py) so re-running without new data only re-predicts, and
+forecast files whose content did not change are left untouched. Run from the
+backend directory:
+
+    python train_forecasts.py                         # every city, default model, through 2030
+    python train_forecasts.py Colaba Sion --models RF GBR
+    python train_forecasts.py --cutoff 2024-01-01     # hold 2024 out, e.g. for /api/backtest
+    python train_forecasts.py --until 2028 --workers 2
+
+Each model writes FutureData/<MODEL>/<city>/<MODEL>_Predicted_<year>.csv with
+a Timestamp column and one Predicted_<pollutant> column per pollutant.
+GBR and RF need scikit-learn: `pip install -r requirements-train.txt`.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import forecasting
+from catalog import list_dirs
+from columnar_store import replace_file
+from data_config import DATA_DIR, FUTURE_DATA_DIR, POLLUTANT_MAP, STANDARD_POLLUTANTS
+from rollups import RollupStore, city_version, load_city_series
+from schema_index import SchemaIndex
+
+DEFAULT_UNTIL = 2030
+
+
+def train_station(city, pollutant, model_name, until, cutoff=None, force=False):
+    """
+    Fit (or load) the model of one city and pollutant and forecast through the
+    end of `until`. Returns (city, pollutant, model_name, days, predictions, status).
+    Runs in a worker process.
+    """
+    schema_index = SchemaIndex(POLLUTANT_MAP)
+    store = RollupStore(DATA_DIR, lambda name, value: load_city_series(DATA_DIR, name, value, schema_index))
+    table = store.get(city, pollutant)["day"]
+    has_data = table["count"] > 0
+    timestamps, means = table["timestamp"][has_data], table["mean"][has_data]
+    if cutoff:
+        before = timestamps < np.datetime64(cutoff, "ns")
+        timestamps, means = timestamps[before], means[before]
+
+    days, values = forecasting.daily_series(timestamps, means)
+    empty = (np.empty(0, dtype="datetime64[D]"), np.empty(0))
+    if int((~np.isnan(values)).sum()) < forecasting.MIN_TRAINING_DAYS:
+        return (city, pollutant, model_name) + empty + ("not enough history",)
+
+    clim = forecasting.climatology(days, values)
+    key = forecasting.cache_key(model_name, city_version(DATA_DIR, city), cutoff)
+    model = None if force else forecasting.load_cached_model(model_name, city, pollutant, key)
+    status = "cached"
+    if model is None:
+        model = forecasting.fit_model(model_name, days, values, clim)
+        forecasting.save_model(model_name, city, pollutant, key, model)
+        status = "trained"
+
+    forecast_days, predictions = forecasting.forecast(
+        model, days, values, clim, np.datetime64(f"{until}-12-31"), days[0]
+    )
+    return city, pollutant, model_name, forecast_days, predictions, status
+
+
+def forecast_frame(series):
+    """Combine {pollutant: (days, predictions)} into one frame with a row per day"""
+    columns = {
+        f"Predicted_{pollutant}": pd.Series(predictions, index=pd.DatetimeIndex(days))
+        for pollutant, (days, predictions) in series.items() if len(days)
+    }
+    frame = pd.DataFrame(columns).sort_index()
+    frame.index.name = "Timestamp"
+    return frame
+
+
+def write_forecast_files(future_data_dir, model_name, city, frame):
+    """Write one <MODEL>_Predicted_<year>.csv per year; return (written, unchanged) counts"""
+    written = unchanged = 0
+    target_dir = os.path.join(future_data_dir, model_name, city)
+    for year, rows in frame.groupby(frame.index.year):
+        content = rows.round(6).to_csv(date_format="%Y-%m-%d")
+        path = os.path.join(target_dir, f"{model_name}_Predicted_{year}.csv")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                if f.read() == content:
+                    unchanged += 1
+                    continue
+        os.makedirs(target_dir, exist_ok=True)
+        replace_file(path, lambda f: f.write(content.encode("utf-8")))
+        written += 1
+    return written, unchanged
+
+
+def train_all(cities=None, pollutants=None, models=None, until=DEFAULT_UNTIL, cutoff=None,
+              future_data_dir=FUTURE_DATA_DIR, workers=None, force=False):
+    """Train every station, pollutant and model and write the forecasts; return (written, unchanged, failed)"""
+    cities = cities or list_dirs(DATA_DIR)
+    pollutants = pollutants or list(STANDARD_POLLUTANTS)
+    models = models or [forecasting.DEFAULT_MODEL]
+    missing = forecasting.unavailable_models(models)
+    if missing:
+        raise RuntimeError(f"scikit-learn is required for {', '.join(missing)} (pip install -r requirements-train.txt)")
+    tasks = [(city, pollutant, model_name) for model_name in models for city in cities for pollutant in pollutants]
+
+    results = {}  # (model, city) -> {pollutant: (days, predictions)}
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            (executor.submit(train_station, city, pollutant, model_name, until, cutoff, force), (city, pollutant, model_name))
+            for city, pollutant, model_name in tasks
+        ]
+        for future, (city, pollutant, model_name) in futures:
+            try:
+                _, _, _, days, predictions, status = future.result()
+            except Exception as e:
+                print(f"Error training {model_name} for {city} {pollutant}: {str(e)}")
+                failed += 1
+                continue
+            print(f"{model_name} {city} {pollutant}: {status}, {len(days)} days forecast")
+            results.setdefault((model_name, city), {})[pollutant] = (days, predictions)
+
+    written = unchanged = 0
+    for (model_name, city), series in results.items():
+        frame = forecast_frame(series)
+        if frame.empty:
+            continue
+        counts = write_forecast_files(future_data_dir, model_name, city, frame)
+        written += counts[0]
+        unchanged += counts[1]
+    return written, unchanged, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train per-station forecasting models and write FutureData files")
+    parser.add_argument("cities", nargs="*", help="Only train these cities (default: all)")
+    parser.add_argument("--pollutants", nargs="*", help="Only these pollutants (default: all standard pollutants)")
+    parser.add_argument("--models", nargs="*", choices=sorted(forecasting.MODELS),
+                        help=f"Models to train (default: {forecasting.DEFAULT_MODEL})")
+    parser.add_argument("--until", type=int, default=DEFAULT_UNTIL, help="Forecast through the end of this year")
+    parser.add_argument("--cutoff", default=None, help="Only train on data before this date (YYYY-MM-DD)")
+    parser.add_argument("--future-data-dir", default=FUTURE_DATA_DIR, help="Directory to write <model>/<city>/*.csv files to")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="Retrain even if a cached model is up to date")
+    args = parser.parse_args()
+
+    if args.cutoff:
+        try:
+            np.datetime64(args.cutoff, "D")
+        except ValueError:
+            parser.error("--cutoff must be a date (YYYY-MM-DD)")
+    missing = forecasting.unavailable_models(args.models or [forecasting.DEFAULT_MODEL])
+    if missing:
+        parser.error(f"scikit-learn is required for {', '.join(missing)}; install it with "
+                     f"`pip install -r requirements-train.txt` or pass --models RIDGE")
+
+    started = time.perf_counter()
+    written, unchanged, failed = train_all(
+        args.cities, args.pollutants, args.models, args.until, args.cutoff,
+        args.future_data_dir, args.workers, args.force
+    )
+    print(f"Model directory: {forecasting.MODEL_DIR}")
+    print(f"Wrote {written} forecast files, {unchanged} unchanged, {failed} failed in {time.perf_counter() - started:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())